@@ -0,0 +1,206 @@
+import numpy as np
+from scipy import sparse
+
+# ============================================
+# APPROXIMATE NEAREST-NEIGHBOR ENGINE (optional)
+# ============================================
+# The TF-IDF matrix is reduced offline with TruncatedSVD to a dense,
+# L2-normalized float32 embedding and the movies are grouped into an
+# inverted file (IVF) with spherical k-means. A query only scores the
+# movies of the `n_probe` lists whose centroids are closest, so the cost
+# depends on the list sizes, not on the catalog size. Stored as .npy:
+#   ann.components.npy  float32 (D, V)  SVD projection of TF-IDF vectors
+#   ann.embedding.npy   float32 (N, D)  normalized movie embeddings
+#   ann.centroids.npy   float32 (L, D)  normalized list centroids
+#   ann.lists.npy       int32   (N,)    list of every movie
+#   ann.order.npy       int32   (N,)    movies grouped by list
+#   ann.offsets.npy     int64   (L+1,)  list boundaries in ann.order
+
+DEFAULT_COMPONENTS = 128
+DEFAULT_PROBES = 8
+# Approximate candidates that are rescored exactly on TF-IDF
+DEFAULT_CANDIDATES = 500
+KMEANS_ITERATIONS = 15
+RECALL_K = 10
+RECALL_SAMPLE_SIZE = 1000
+ASSIGN_BLOCK_SIZE = 8192
+
+ANN_ARRAYS = ['components', 'embedding', 'centroids', 'lists', 'order', 'offsets']
+
+
+def normalize_rows(matrix):
+    """L2-normalize the rows of a dense matrix (zero rows stay zero)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (matrix / norms).astype(np.float32)
+
+
+def assign_lists(embedding, centroids):
+    """Closest centroid of every row, in blocks to bound memory"""
+    lists = np.empty(len(embedding), dtype=np.int32)
+    for start in range(0, len(embedding), ASSIGN_BLOCK_SIZE):
+        block = embedding[start:start + ASSIGN_BLOCK_SIZE]
+        lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return lists
+
+
+def spherical_kmeans(embedding, n_lists, iterations=KMEANS_ITERATIONS, seed=42):
+    """Cluster normalized rows by cosine similarity. Returns (centroids, lists)."""
+    rng = np.random.default_rng(seed)
+    n_movies = len(embedding)
+    centroids = embedding[rng.choice(n_movies, n_lists, replace=False)].copy()
+    lists = assign_lists(embedding, centroids)
+    for _ in range(iterations):
+        membership = sparse.csr_matrix(
+            (np.ones(n_movies, dtype=np.float32), (lists, np.arange(n_movies))),
+            shape=(n_lists, n_movies)
+        )
+        sums = np.asarray(membership @ embedding)
+        empty = np.asarray(membership.sum(axis=1)).ravel() == 0
+        # Empty lists restart from random movies
+        sums[empty] = embedding[rng.choice(n_movies, int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+        new_lists = assign_lists(embedding, centroids)
+        if np.array_equal(new_lists, lists):
+            break
+        lists = new_lists
+    return centroids, lists
+
+
+def group_lists(lists, n_lists):
+    """(order, offsets) of the movies grouped by list"""
+    order = np.argsort(lists, kind='stable').astype(np.int32)
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(lists, minlength=n_lists))
+    return order, offsets
+
+
+def build_ann_index(tfidf_matrix, n_components=DEFAULT_COMPONENTS, n_lists=None, seed=42):
+    """Fit the SVD projection and the IVF lists for a TF-IDF matrix.
+
+    `n_lists` defaults to about sqrt(N). Returns the arrays dict stored by
+    save_ann_index.
+    """
+    # Only the offline build needs the SVD
+    from sklearn.decomposition import TruncatedSVD
+
+    n_movies, n_terms = tfidf_matrix.shape
+    n_components = max(1, min(n_components, n_terms - 1, n_movies - 1))
+    svd = TruncatedSVD(n_components=n_components, random_state=seed)
+    embedding = normalize_rows(svd.fit_transform(tfidf_matrix))
+
+    n_lists = n_lists or int(round(np.sqrt(n_movies)))
+    n_lists = max(1, min(n_lists, n_movies))
+    centroids, lists = spherical_kmeans(embedding, n_lists, seed=seed)
+    order, offsets = group_lists(lists, n_lists)
+    return {
+        'components': svd.components_.astype(np.float32),
+        'embedding': embedding,
+        'centroids': centroids,
+        'lists': lists,
+        'order': order,
+        'offsets': offsets,
+    }
+
+
+def update_ann_index(arrays, tfidf_matrix, changed):
+    """Embed and assign the changed rows with the fitted projection and lists"""
+    changed = np.asarray(changed, dtype=np.int64)
+    n_movies = tfidf_matrix.shape[0]
+    components = np.asarray(arrays['components'])
+    centroids = np.asarray(arrays['centroids'])
+
+    embedding = np.zeros((n_movies, components.shape[0]), dtype=np.float32)
+    old = np.asarray(arrays['embedding'])
+    embedding[:len(old)] = old
+    lists = np.zeros(n_movies, dtype=np.int32)
+    lists[:len(old)] = np.asarray(arrays['lists'])
+
+    if len(changed):
+        embedding[changed] = normalize_rows(np.asarray(tfidf_matrix[changed] @ components.T))
+        lists[changed] = assign_lists(embedding[changed], centroids)
+    order, offsets = group_lists(lists, len(centroids))
+    return dict(arrays, embedding=embedding, lists=lists, order=order, offsets=offsets)
+
+
+def save_ann_index(version_dir, arrays):
+    """Write the ANN arrays as .npy files"""
+    for name in ANN_ARRAYS:
+        np.save(version_dir / f"ann.{name}.npy", arrays[name])
+
+
+def load_ann_index(version_dir, mmap_mode='r', n_probe=DEFAULT_PROBES):
+    """Open the arrays written by save_ann_index"""
+    arrays = {
+        name: np.load(version_dir / f"ann.{name}.npy", mmap_mode=mmap_mode)
+        for name in ANN_ARRAYS
+    }
+    return AnnIndex(arrays, n_probe=n_probe)
+
+
+class AnnIndex:
+    """IVF search over the SVD embedding"""
+
+    def __init__(self, arrays, n_probe=DEFAULT_PROBES):
+        self.arrays = arrays
+        self.components = arrays['components']
+        self.embedding = arrays['embedding']
+        self.centroids = arrays['centroids']
+        self.order = arrays['order']
+        self.offsets = arrays['offsets']
+        self.n_probe = n_probe
+
+    def project(self, query):
+        """Normalized embedding of a dense TF-IDF query vector"""
+        embedded = self.components @ query
+        norm = np.linalg.norm(embedded)
+        return embedded / norm if norm > 0 else embedded
+
+    def candidates(self, embedded, n_probe=None):
+        """Movies in the lists closest to an embedded query"""
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        centroid_scores = self.centroids @ embedded
+        probes = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        return np.concatenate([self.order[self.offsets[p]:self.offsets[p + 1]] for p in probes])
+
+    def search(self, query, count, n_probe=None):
+        """Approximate top `count` movies of a dense TF-IDF query vector.
+
+        Returns (indices, approximate cosine scores) sorted by score.
+        """
+        embedded = self.project(query)
+        candidates = self.candidates(embedded, n_probe)
+        scores = self.embedding[candidates] @ embedded
+        if count < len(candidates):
+            top = np.argpartition(-scores, count - 1)[:count]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return candidates[order], scores[order]
+
+
+def recall_at_k(ann_index, tfidf_matrix, neighbor_indices, k=RECALL_K, pool=DEFAULT_CANDIDATES,
+                sample_size=RECALL_SAMPLE_SIZE, seed=42):
+    """Share of the exact top-k neighbors the ANN engine finds for sampled movies.
+
+    The exact answer is the prebuilt neighbor index. Like serving, the ANN
+    engine takes `pool` candidates and rescores them exactly on TF-IDF.
+    """
+    n_movies = tfidf_matrix.shape[0]
+    k = min(k, neighbor_indices.shape[1])
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(n_movies, min(sample_size, n_movies), replace=False)
+
+    found = expected = 0
+    for movie_idx in sample:
+        exact = np.asarray(neighbor_indices[movie_idx][:k])
+        exact = set(exact[exact >= 0].tolist())
+        if not exact:
+            continue
+        query = tfidf_matrix[movie_idx].toarray().ravel().astype(np.float32)
+        candidates, _ = ann_index.search(query, pool + 1)
+        candidates = candidates[candidates != movie_idx]
+        exact_scores = tfidf_matrix[candidates] @ query
+        best = candidates[np.argsort(-exact_scores, kind='stable')[:k]]
+        found += len(exact & set(best.tolist()))
+        expected += len(exact)
+    return found / expected if expected else 1.0
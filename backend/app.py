@@ -1,34 +1,31 @@
+import hashlib
+import json
 import numpy as np
-import pandas as pd
-import difflib
-from flask import Flask, render_template, request, jsonify
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
+from flask import Flask, Response, g, render_template, request, jsonify
+import logging
 import os
+import re
+import sys
+import threading
+import time
 from pathlib import Path
-import random 
-import joblib
 
+sys.path.append(str(Path(__file__).parent))
 
-# Flask secret key
-SECRET_KEY = os.environ.get("SECRET_KEY", "mysecret123")
-
-BASE = os.path.dirname(os.path.abspath(__file__))
+from artifacts import load_artifacts, get_current_version, set_current_version
+from filters import MovieFilter
+from lru_cache import MISSING
+from metrics import Histogram, SharedMetrics, render_metrics
+from model_bundle import ModelBundle
+from profiler import DEFAULT_INTERVAL, format_collapsed, sample_stacks
+from recommendation_store import StoreBundle
+from rerank import rerank
+from sessions import SessionStore, session_scores
+from suggest import DEFAULT_LIMIT as SUGGEST_DEFAULT_LIMIT
 
-# Paths to your pre-trained files
-MOVIES_DATA_PATH = os.environ.get("MOVIES_DATA_PATH", "models/movies_data.pkl")
-MOVIES_CSV_PATH = os.path.join(BASE, "backend/data/movies.csv")
-SIMILARITY_MATRIX_PATH = os.environ.get("SIMILARITY_MATRIX_PATH", "models/similarity_matrix.npy")
-VECTOR_PATH = os.environ.get("VECTORIZER_PATH", "models/vectorizer.pkl")
-FEATURES_PATH = os.environ.get("FEATURES_PATH", "models/combined_features.pkl")
-
-# Load models/data
-movies_data = joblib.load(MOVIES_DATA_PATH)
-similarity_matrix = np.load(SIMILARITY_MATRIX_PATH)
-vectorizer = joblib.load(VECTOR_PATH)
-combined_features = joblib.load(FEATURES_PATH)
 
+# Flask secret key
+SECRET_KEY = os.environ.get("SECRET_KEY", "mysecret123")
 
 app = Flask(__name__)
 
@@ -36,241 +33,663 @@ app = Flask(__name__)
 # PATHS
 # ============================================
 BASE_DIR = Path(__file__).parent
-DATA_DIR = BASE_DIR / "data"
-MODELS_DIR = BASE_DIR / "models"
+MODELS_DIR = Path(os.environ.get("MODELS_DIR", BASE_DIR / "models"))
+MODEL_VERSION = os.environ.get("MODEL_VERSION") or None
+# Hash every artifact file against the manifest checksums when loading
+# (0 only compares file sizes)
+VERIFY_CHECKSUM = os.environ.get("VERIFY_CHECKSUM", "1") == "1"
+# 'model' computes recommendations from the artifacts, 'store' reads them
+# from the version's precomputed recommendations.sqlite (build_store.py)
+# and never loads the TF-IDF matrix or the neighbor index
+SERVING_MODE = os.environ.get("SERVING_MODE", "model").lower()
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 1000))
+
+# Free-text / multi-seed queries
+QUERY_DEFAULT_COUNT = int(os.environ.get("QUERY_DEFAULT_COUNT", 10))
+QUERY_MAX_COUNT = int(os.environ.get("QUERY_MAX_COUNT", 50))
+QUERY_MAX_SEEDS = int(os.environ.get("QUERY_MAX_SEEDS", 20))
+
+# Query scoring engine: 'exact' (full TF-IDF mat-vec) or 'ann' (SVD + IVF
+# candidates, built with build_model.py --ann, rescored exactly)
+SEARCH_ENGINE = os.environ.get("SEARCH_ENGINE", "exact").lower()
+ANN_PROBES = int(os.environ.get("ANN_PROBES", 8))
+ANN_CANDIDATES = int(os.environ.get("ANN_CANDIDATES", 500))
+
+# Hybrid re-ranking: similarity blended with popularity/recency, then MMR
+# diversity over a pool of similar movies. Used when RERANK=1 or when a
+# request sends "rerank": true / {"popularity": .., "recency": .., "diversity": ..}
+RERANK = os.environ.get("RERANK", "0") == "1"
+RERANK_POOL = int(os.environ.get("RERANK_POOL", 200))
+RERANK_POPULARITY_WEIGHT = float(os.environ.get("RERANK_POPULARITY_WEIGHT", 0.1))
+RERANK_RECENCY_WEIGHT = float(os.environ.get("RERANK_RECENCY_WEIGHT", 0.05))
+RERANK_DIVERSITY = float(os.environ.get("RERANK_DIVERSITY", 0.3))
+
+# Viewing sessions ("because you watched"): one SQLite file shared by
+# all workers, the least recently updated sessions are deleted past
+# SESSION_MAX and a session expires SESSION_TTL seconds after its last
+# update
+SESSION_DB = Path(os.environ.get("SESSION_DB", BASE_DIR / "sessions.sqlite"))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", 10000))
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 1800))
+SESSION_HISTORY = int(os.environ.get("SESSION_HISTORY", 20))
+SESSION_DECAY = float(os.environ.get("SESSION_DECAY", 0.8))
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+SESSION_ID_MESSAGE = 'Session ids are 1-128 letters, digits, - or _'
+
+# Catalog listing page size
+MOVIES_DEFAULT_LIMIT = int(os.environ.get("MOVIES_DEFAULT_LIMIT", 100))
+MOVIES_MAX_LIMIT = int(os.environ.get("MOVIES_MAX_LIMIT", 1000))
 
-print("="*60)
-print("🎬 MOVIE RECOMMENDATION SYSTEM")
-print("="*60)
+# Typeahead: seconds browsers and proxies may reuse a /suggest response
+SUGGEST_CACHE_SECONDS = int(os.environ.get("SUGGEST_CACHE_SECONDS", 300))
+
+# Result caches (size 0 disables a cache, TTL 0 means entries never expire)
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 10000))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 10000))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 0)) or None
+
+# Seconds between checks of models/CURRENT for a new version (0 disables;
+# pinning MODEL_VERSION also disables it)
+RELOAD_INTERVAL = float(os.environ.get("RELOAD_INTERVAL", 5))
+
+# Admin API (disabled unless a token is configured)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Development server only (production: gunicorn -c backend/gunicorn.conf.py)
+DEBUG = os.environ.get("FLASK_DEBUG", "0") == "1"
+PORT = int(os.environ.get("PORT", 5000))
 
 # ============================================
-# LOAD YOUR MOVIES.CSV
+# LOGGING AND METRICS
 # ============================================
-print("\n📂 Loading movies.csv...")
-MOVIES_CSV_PATH = DATA_DIR / "movies.csv"
+# Per-request messages are DEBUG, so at the default INFO level they cost
+# one level check and are never formatted or written.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s [%(process)d] %(message)s")
+logger = logging.getLogger("movie_recommender")
 
-if MOVIES_CSV_PATH.exists():
-    movies_data = pd.read_csv(MOVIES_CSV_PATH)
-    print(f"✅ Loaded {len(movies_data)} movies")
-else:
-    print("❌ ERROR: movies.csv not found!")
-    exit(1)
+# Where a request spends its time: title resolution, scoring (neighbor
+# row gather or TF-IDF mat-vec), top-K selection, building the response
+# dicts and JSON serialization. Exported on /metrics.
+STAGE_SECONDS = Histogram(
+    'movie_stage_duration_seconds', 'Time spent in each stage of a recommendation request', 'stage'
+)
+REQUEST_SECONDS = Histogram(
+    'movie_request_duration_seconds', 'Request latency by endpoint', 'endpoint'
+)
+# Directory where the gunicorn workers share their totals (set by
+# gunicorn.conf.py); without it /metrics reports this process only
+METRICS_DIR = os.environ.get("METRICS_DIR")
+
+logger.info("="*60)
+logger.info("🎬 MOVIE RECOMMENDATION SYSTEM")
+logger.info("="*60)
 
 # ============================================
-# SIMPLE PREPROCESSING
+# LOAD PREBUILT ARTIFACTS (no training here)
 # ============================================
-print("\n🔄 Preprocessing data...")
-
-# Reset index
-movies_data = movies_data.reset_index(drop=True)
-
-# Identify available features
-available_features = []
-for feature in ['genres', 'keywords', 'cast', 'director', 'tagline']:
-    if feature in movies_data.columns:
-        available_features.append(feature)
-        print(f"   ✓ Found: {feature}")
-
-# Fill missing values
-for feature in available_features:
-    movies_data[feature] = movies_data[feature].fillna('').astype(str)
-
-# Combine features
-print("   Combining features...")
-def combine_features(row):
-    combined = []
-    for feature in available_features:
-        value = row[feature]
-        if value and value.lower() != 'nan':
-            # Clean separators
-            if feature in ['genres', 'keywords', 'cast']:
-                value = value.replace('|', ' ').replace(',', ' ')
-            combined.append(value.strip())
-    return ' '.join(combined)
-
-movies_data['combined_features'] = movies_data.apply(combine_features, axis=1)
-print(f"✅ Preprocessed {len(movies_data)} movies")
+# Build them offline with: python build_model.py
+#
+# The loaded version is one ModelBundle behind the `current_model`
+# reference. Every request reads that reference once and passes the
+# bundle down, and a reload replaces it with a single assignment, so
+# in-flight requests finish on the version they started with.
+reload_lock = threading.Lock()
+failed_versions = set()
+
+def load_model(version=None, checksum=None):
+    """Load and validate an artifact version, then swap it in atomically"""
+    global current_model
+    
+    with reload_lock:
+        if SERVING_MODE == 'store':
+            model = StoreBundle(
+                MODELS_DIR, version, verify=VERIFY_CHECKSUM, checksum=checksum,
+                query_cache_size=QUERY_CACHE_SIZE,
+                cache_ttl=CACHE_TTL
+            ).validate()
+        else:
+            model = ModelBundle(
+                load_artifacts(MODELS_DIR, version, verify=VERIFY_CHECKSUM, checksum=checksum),
+                query_cache_size=QUERY_CACHE_SIZE,
+                result_cache_size=RESULT_CACHE_SIZE,
+                cache_ttl=CACHE_TTL,
+                ann_probes=ANN_PROBES
+            ).validate()
+        if model.ann_index is None and SEARCH_ENGINE == 'ann' and SERVING_MODE != 'store':
+            logger.warning("⚠️ SEARCH_ENGINE=ann but this version has no ANN engine, using exact scoring")
+        current_model = model
+    
+    logger.info("✅ Loaded model version %s (%d movies)", model.version, len(model))
+    return model
+
+logger.info("📂 Loading model artifacts from %s...", MODELS_DIR)
+
+try:
+    load_model(MODEL_VERSION)
+except (FileNotFoundError, ValueError) as e:
+    logger.error("❌ ERROR: %s", e)
+    logger.error("   Run 'python build_model.py' to build the model first")
+    if SERVING_MODE == 'store':
+        logger.error("   and 'python build_store.py' to precompute its recommendations")
+    sys.exit(1)
 
 # ============================================
-# CREATE/TRAIN MODEL
+# HOT RELOAD
 # ============================================
-print("\n🧠 Training model...")
-
-# Create TF-IDF vectors
-vectorizer = TfidfVectorizer(
-    stop_words='english',
-    max_features=5000,
-    min_df=1,
-    max_df=0.9
-)
+# Every worker process polls models/CURRENT and loads a new version in a
+# background thread while the old one keeps serving. A version that fails
+# to load or validate is skipped until CURRENT changes again; one whose
+# files are missing (e.g. its recommendation store is still being
+# written) is retried on the next poll.
+watcher_pid = None
+waiting_versions = set()
+
+def check_for_new_version():
+    """Load the version named by CURRENT if it is not the one being served"""
+    version = get_current_version(MODELS_DIR)
+    if not version or version == current_model.version or version in failed_versions:
+        return False
+    try:
+        load_model(version)
+        waiting_versions.discard(version)
+        return True
+    except FileNotFoundError as e:
+        if version not in waiting_versions:
+            waiting_versions.add(version)
+            logger.warning("⚠️ Model version %s is not complete yet, still serving %s: %s", version, current_model.version, e)
+        return False
+    except Exception as e:
+        failed_versions.add(version)
+        logger.error("❌ Could not load model version %s, still serving %s: %s", version, current_model.version, e)
+        return False
+
+def watch_models():
+    """Background loop of check_for_new_version"""
+    while True:
+        time.sleep(RELOAD_INTERVAL)
+        try:
+            check_for_new_version()
+        except Exception as e:
+            logger.exception("❌ Model watcher error: %s", e)
 
-tfidf_matrix = vectorizer.fit_transform(movies_data['combined_features'])
-print(f"   TF-IDF matrix shape: {tfidf_matrix.shape}")
+def ensure_watcher():
+    """Start the watcher once per process (threads do not survive gunicorn's fork)"""
+    global watcher_pid
+    if RELOAD_INTERVAL <= 0 or MODEL_VERSION or watcher_pid == os.getpid():
+        return
+    with reload_lock:
+        if watcher_pid == os.getpid():
+            return
+        watcher_pid = os.getpid()
+    threading.Thread(target=watch_models, name='model-watcher', daemon=True).start()
 
-# Calculate similarity matrix
-similarity_matrix = cosine_similarity(tfidf_matrix)
-print(f"   Similarity matrix shape: {similarity_matrix.shape}")
+@app.before_request
+def start_model_watcher():
+    ensure_watcher()
 
-# Save model for future
-MODELS_DIR.mkdir(exist_ok=True)
-with open(MODELS_DIR / "similarity_matrix.npy", 'wb') as f:
-    np.save(f, similarity_matrix)
-with open(MODELS_DIR / "vectorizer.pkl", 'wb') as f:
-    pickle.dump(vectorizer, f)
-with open(MODELS_DIR / "movies_data.pkl", 'wb') as f:
-    pickle.dump(movies_data, f)
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
 
-print("✅ Model trained and saved")
+@app.after_request
+def observe_request(response):
+    start = g.get('request_start')
+    if start is not None and request.url_rule is not None:
+        REQUEST_SECONDS.observe(request.url_rule.rule, time.perf_counter() - start)
+    return response
+
+def json_response(payload):
+    """jsonify, timed as the serialize stage"""
+    with STAGE_SECONDS.time('serialize'):
+        return jsonify(payload)
 
 # ============================================
 # SIMPLE SEARCH FUNCTION
 # ============================================
-def simple_movie_search(search_term):
-    """Simple but effective movie search"""
-    all_titles = movies_data['title'].tolist()
-    search_lower = search_term.lower().strip()
-    
-    # 1. Exact match
-    for title in all_titles:
-        if title.lower() == search_lower:
-            return title
-    
-    # 2. Contains match
-    for title in all_titles:
-        if search_lower in title.lower():
-            return title
-    
-    # 3. Word-by-word match
-    search_words = search_lower.split()
-    for title in all_titles:
-        title_lower = title.lower()
-        match_count = 0
-        for word in search_words:
-            if word in title_lower:
-                match_count += 1
-        if match_count >= len(search_words) - 1:  # Allow 1 missing word
-            return title
-    
-    # 4. Fuzzy match
-    matches = difflib.get_close_matches(search_term, all_titles, n=1, cutoff=0.3)
-    if matches:
-        return matches[0]
-    
-    return None
+def simple_movie_search(model, search_term):
+    """Simple but effective movie search (exact, contains, words, fuzzy)"""
+    return model.title_index.resolve(search_term)
 
 # ============================================
 # WORKING RECOMMENDATION FUNCTION
 # ============================================
-import random  # Add this at top of file
+def movie_info(model, idx, similarity, is_searched=False):
+    """Recommendation card for one movie, from the precomputed display strings"""
+    return {
+        'title': model.all_titles[idx],
+        'similarity': similarity,
+        'is_searched': is_searched,
+        'director': model.display_directors[idx] if model.display_directors is not None else '',
+        'genres': model.display_genres[idx] if model.display_genres is not None else ''
+    }
 
-def get_recommendations(search_term):
-    """Get recommendations with RANDOMIZED count (5-15)"""
-    print(f"\n🔍 Searching for: '{search_term}'")
-    
-    # Find movie
-    found_movie = simple_movie_search(search_term)
+def top_neighbors(model, movie_idx, count, row=None, scores=None):
+    """Best `count` neighbors of a movie, skipping itself and repeated titles.
+
+    Neighbor rows are stored sorted by score, so the top-K is a prefix of
+    the row and the cost only depends on K, not on the catalog size.
+    `row`/`scores` can be passed in when the caller already gathered them.
+    """
+    if row is None:
+        row = model.neighbor_indices[movie_idx]
+        scores = model.neighbor_scores[movie_idx]
+    valid = (row >= 0) & (row != movie_idx) & (scores > 0)
+    row = row[valid]
+    scores = scores[valid]
     
-    if not found_movie:
-        sample_movies = movies_data['title'].head(10).tolist()
-        return {
-            'success': False,
-            'message': f'No similar movies were found for "{search_term}".',
-            'suggestions': sample_movies,
-            'searched': search_term,
-            'found': None
-        }
+    # Keep the best-scoring movie of every title, except the searched title
+    groups = model.title_groups[row]
+    _, first = np.unique(groups, return_index=True)
+    first.sort()
+    first = first[groups[first] != model.title_groups[movie_idx]]
+    keep = first[:count]
+    return row[keep], scores[keep]
+
+def tfidf_row(model, movie_idx):
+    """Dense TF-IDF row of a movie (stored L2-normalized)"""
+    matrix = model.tfidf_matrix
+    start, end = matrix.indptr[movie_idx], matrix.indptr[movie_idx + 1]
+    query = np.zeros(matrix.shape[1], dtype=np.float32)
+    query[matrix.indices[start:end]] = matrix.data[start:end]
+    return query
+
+def filtered_neighbors(model, movie_idx, count, row, scores, movie_filter):
+    """top_neighbors restricted to the movies that pass movie_filter.
+
+    The stored neighbors are filtered first, which costs the same as the
+    unfiltered lookup. Only when fewer than `count` pass and the row is
+    full (more similar movies exist past the top-K) are all matching
+    movies scored against the movie's TF-IDF row.
+    """
+    valid = row >= 0
+    keep = valid & movie_filter.matches(np.where(valid, row, 0))
+    similar_indices, similar_scores = top_neighbors(model, movie_idx, count, row[keep], scores[keep])
+    row_is_full = row[-1] >= 0 and scores[-1] > 0
+    if len(similar_indices) >= count or not row_is_full:
+        return similar_indices, similar_scores
     
-    # Get movie index
-    movie_idx = movies_data[movies_data['title'] == found_movie].index[0]
+    candidates = movie_filter.selection()
+    if len(candidates) == 0:
+        return similar_indices, similar_scores
+    matrix = model.tfidf_matrix
+    query = tfidf_row(model, movie_idx)
+    if len(candidates) > len(model) // 4:
+        candidate_scores = (matrix @ query)[candidates]
+    else:
+        candidate_scores = matrix[candidates] @ query
+    pool = 4 * count + 50
+    if pool < len(candidate_scores):
+        best = np.argpartition(-candidate_scores, pool - 1)[:pool]
+        candidates, candidate_scores = candidates[best], candidate_scores[best]
+    return rank_query_scores(model, candidates, candidate_scores, count, exclude=np.array([movie_idx]))
+
+def candidate_pool(model, movie_idx, row, size):
+    """Up to `size` similar movies: the stored neighbors plus the neighbors
+    of the closest ones, scored exactly against the movie, one per title.
+    """
+    first = row[row >= 0]
+    expand = first[:2 * -(-size // max(len(row), 1))]
+    second = np.asarray(model.neighbor_indices[expand]).ravel()
+    candidates = np.unique(np.concatenate([first, second[second >= 0]]))
+    candidates = candidates[candidates != movie_idx]
+    similarities = model.tfidf_matrix[candidates] @ tfidf_row(model, movie_idx)
+    return rank_query_scores(model, candidates, similarities, size, exclude=np.array([movie_idx]))
+
+def reranked_neighbors(model, movie_idx, count, row, scores, movie_filter, rerank_params):
+    """Neighbors re-ordered by popularity/recency and MMR diversity"""
+    candidates, similarities = candidate_pool(model, movie_idx, row, RERANK_POOL)
+    if movie_filter:
+        keep = movie_filter.matches(candidates)
+        candidates, similarities = candidates[keep], similarities[keep]
+        if len(candidates) < count:
+            candidates, similarities = filtered_neighbors(model, movie_idx, count, row, scores, movie_filter)
+    return rerank(
+        candidates, similarities, model.tfidf_matrix[candidates],
+        model.popularity_score, model.recency_score, count, *rerank_params
+    )
+
+def rerank_settings(value):
+    """(popularity weight, recency weight, diversity) from a request value, or None"""
+    if value is None:
+        value = RERANK
+    if value is False:
+        return None
+    params = {'popularity': RERANK_POPULARITY_WEIGHT, 'recency': RERANK_RECENCY_WEIGHT,
+              'diversity': RERANK_DIVERSITY}
+    if isinstance(value, dict):
+        unknown = set(value) - set(params)
+        if unknown:
+            raise ValueError(f"Unknown rerank settings: {', '.join(sorted(unknown))}")
+        for name, weight in value.items():
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                raise ValueError(f"rerank.{name} must be a number")
+            params[name] = float(weight)
+    elif value is not True:
+        raise ValueError("rerank must be true, false or an object of weights")
+    if not 0 <= params['diversity'] <= 1:
+        raise ValueError("rerank.diversity must be between 0 and 1")
+    return params['popularity'], params['recency'], params['diversity']
+
+def not_found_response(model, search_term):
+    """Response for a search term that matched no movie"""
+    return {
+        'success': False,
+        'message': f'No similar movies were found for "{search_term}".',
+        'suggestions': model.all_titles[:10],
+        'searched': search_term,
+        'found': None
+    }
+
+def recommendation_count(model, movie_idx):
+    """Different movies get different counts (5-15), fixed per title.
+
+    A plain array lookup: no RNG and no shared state on the request path.
+    """
+    return int(model.result_counts[movie_idx])
+
+def recommendation_response(model, search_term, found_movie, row=None, scores=None, movie_filter=None,
+                            rerank_params=None):
+    """Build the recommendation payload for a resolved title"""
+    movie_idx = model.title_to_index[found_movie]
+    target_count = recommendation_count(model, movie_idx)
+    if row is None:
+        # Scores are precomputed, scoring is reading the neighbor row
+        with STAGE_SECONDS.time('score'):
+            row = np.asarray(model.neighbor_indices[movie_idx])
+            scores = np.asarray(model.neighbor_scores[movie_idx])
     
-    # Get similarity scores
-    movie_similarity = similarity_matrix[movie_idx]
+    # Take the top N recommendations, searched movie always first
+    with STAGE_SECONDS.time('topk'):
+        if rerank_params:
+            similar_indices, similar_scores = reranked_neighbors(
+                model, movie_idx, target_count, row, scores, movie_filter, rerank_params
+            )
+        elif movie_filter:
+            similar_indices, similar_scores = filtered_neighbors(
+                model, movie_idx, target_count, row, scores, movie_filter
+            )
+        else:
+            similar_indices, similar_scores = top_neighbors(model, movie_idx, target_count, row, scores)
+    with STAGE_SECONDS.time('format'):
+        recommendations = [movie_info(model, movie_idx, 1.0, is_searched=True)]
+        recommendations.extend(
+            movie_info(model, idx, score)
+            for idx, score in zip(similar_indices.tolist(), similar_scores.tolist())
+        )
     
-    # Get ALL similar movies (including itself)
-    similar_indices = np.argsort(movie_similarity)[::-1]
+    return {
+        'success': True,
+        'searched': search_term,
+        'found': found_movie,
+        'recommendations': recommendations
+    }
+
+def resolve_title(model, search_term):
+    """simple_movie_search through the query cache"""
+    with STAGE_SECONDS.time('resolve'):
+        found_movie = model.query_cache.get(search_term)
+        if found_movie is MISSING:
+            found_movie = simple_movie_search(model, search_term)
+            model.query_cache.put(search_term, found_movie)
+    return found_movie
+
+def cached_recommendation_response(model, search_term, found_movie, row=None, scores=None, movie_filter=None,
+                                   rerank_params=None):
+    """recommendation_response through the result cache"""
+    key = found_movie
+    if movie_filter or rerank_params:
+        key = ('custom', found_movie, movie_filter.key if movie_filter else None, rerank_params)
+    result = model.result_cache.get(key, None)
+    if result is None:
+        result = recommendation_response(model, search_term, found_movie, row, scores, movie_filter, rerank_params)
+        model.result_cache.put(key, result)
+    if result['searched'] != search_term:
+        result = dict(result, searched=search_term)
+    return result
+
+def stored_recommendations(model, search_term, filters=None, rerank=None):
+    """get_recommendations from the precomputed store (SERVING_MODE=store).
+
+    An exact title is one indexed read; anything else goes through the
+    title resolver first. No NumPy work on the stored lists.
+    """
+    if filters or rerank not in (None, False):
+        raise ValueError("filters and rerank need SERVING_MODE=model")
+    with STAGE_SECONDS.time('resolve'):
+        payload = model.store.get_exact(search_term)
+    if payload is None:
+        found_movie = resolve_title(model, search_term)
+        if not found_movie:
+            logger.debug("🔍 '%s': no match", search_term)
+            return not_found_response(model, search_term)
+        with STAGE_SECONDS.time('score'):
+            payload = model.store.get(found_movie)
+    with STAGE_SECONDS.time('format'):
+        result = json.loads(payload)
+    result['searched'] = search_term
+    logger.debug("🔍 '%s' -> '%s': %d recommendations", search_term, result['found'], len(result['recommendations']))
+    return result
+
+def get_recommendations(search_term, model=None, filters=None, rerank=None):
+    """Get recommendations with RANDOMIZED count (5-15).
+
+    `filters` (see filters.py) restricts the recommended movies and
+    `rerank` (see rerank_settings) re-orders them; both raise ValueError
+    when invalid.
+    """
+    model = model or current_model
+    if isinstance(model, StoreBundle):
+        return stored_recommendations(model, search_term, filters, rerank)
+    movie_filter = MovieFilter(model, filters) if filters else None
+    rerank_params = rerank_settings(rerank)
     
-    recommendations = []
-    seen_titles = set()
+    # Find movie
+    found_movie = resolve_title(model, search_term)
     
-    # Always add searched movie first
-    searched_movie_info = {
-        'title': found_movie,
-        'similarity': 1.0,
-        'is_searched': True,
-        'director': '',
-        'genres': ''
-    }
+    if not found_movie:
+        logger.debug("🔍 '%s': no match", search_term)
+        return not_found_response(model, search_term)
     
-    if 'director' in movies_data.columns:
-        director = movies_data.iloc[movie_idx]['director']
-        if isinstance(director, str) and director.strip():
-            searched_movie_info['director'] = director.replace('|', ', ')[:50]
+    result = cached_recommendation_response(
+        model, search_term, found_movie, movie_filter=movie_filter, rerank_params=rerank_params
+    )
+    logger.debug("🔍 '%s' -> '%s': %d recommendations", search_term, found_movie, len(result['recommendations']))
     
-    if 'genres' in movies_data.columns:
-        genres = movies_data.iloc[movie_idx]['genres']
-        if isinstance(genres, str) and genres.strip():
-            searched_movie_info['genres'] = genres.replace('|', ', ')[:50]
+    return result
+
+def get_recommendations_batch(search_terms, model=None, filters=None, rerank=None):
+    """Recommendations for many search terms, returned in the same order.
+
+    Every distinct term is resolved once and the neighbor rows of all
+    found movies are gathered from the index in a single NumPy take.
+    The same `filters` and `rerank` settings apply to every term.
+    """
+    model = model or current_model
+    if isinstance(model, StoreBundle):
+        return [stored_recommendations(model, term, filters, rerank) for term in search_terms]
+    movie_filter = MovieFilter(model, filters) if filters else None
+    rerank_params = rerank_settings(rerank)
+    resolved = {}
+    for term in search_terms:
+        if term not in resolved:
+            resolved[term] = resolve_title(model, term)
     
-    recommendations.append(searched_movie_info)
-    seen_titles.add(found_movie)
+    found_titles = sorted({t for t in resolved.values() if t})
+    found_indices = np.array([model.title_to_index[t] for t in found_titles], dtype=np.int64)
+    with STAGE_SECONDS.time('score'):
+        rows = model.neighbor_indices[found_indices]
+        scores = model.neighbor_scores[found_indices]
+    position = {title: i for i, title in enumerate(found_titles)}
     
-    # Create list of all possible recommendations
-    all_possible = []
-    for idx in similar_indices:
-        if idx == movie_idx:
+    results = []
+    for term in search_terms:
+        found_movie = resolved[term]
+        if not found_movie:
+            results.append(not_found_response(model, term))
             continue
-        
-        similarity_score = movie_similarity[idx]
-        movie_title = movies_data.iloc[idx]['title']
-        
-        if movie_title not in seen_titles and similarity_score > 0:
-            movie_info = {
-                'title': movie_title,
-                'similarity': float(similarity_score),
-                'is_searched': False,
-                'director': '',
-                'genres': ''
-            }
-            
-            if 'director' in movies_data.columns:
-                director = movies_data.iloc[idx]['director']
-                if isinstance(director, str) and director.strip():
-                    movie_info['director'] = director.replace('|', ', ')[:50]
-            
-            if 'genres' in movies_data.columns:
-                genres = movies_data.iloc[idx]['genres']
-                if isinstance(genres, str) and genres.strip():
-                    movie_info['genres'] = genres.replace('|', ', ')[:50]
-            
-            all_possible.append(movie_info)
-            seen_titles.add(movie_title)
+        i = position[found_movie]
+        results.append(cached_recommendation_response(
+            model, term, found_movie, rows[i], scores[i], movie_filter, rerank_params
+        ))
+    return results
+
+# ============================================
+# FREE-TEXT AND MULTI-SEED QUERIES
+# ============================================
+# The fitted vectorizer turns free text into a TF-IDF vector; seed movies
+# contribute their stored (L2-normalized) TF-IDF rows. The average is
+# scored against the memory-mapped CSR matrix with one sparse mat-vec, or
+# with SEARCH_ENGINE=ann only the ANN candidates are scored.
+def query_vector(model, text=None, seed_indices=()):
+    """L2-normalized dense query vector, or None when nothing is known"""
+    query = np.zeros(model.tfidf_matrix.shape[1], dtype=np.float32)
+    if text:
+        text_row = model.vectorizer.transform([text])
+        query[text_row.indices] += text_row.data.astype(np.float32)
+    if len(seed_indices):
+        query += np.asarray(model.tfidf_matrix[seed_indices].sum(axis=0), dtype=np.float32).ravel()
+    norm = np.linalg.norm(query)
+    if norm == 0:
+        return None
+    return query / norm
+
+def rank_query_scores(model, candidates, scores, count, exclude=()):
+    """Best `count` candidates by score, skipping the seeds and repeated titles"""
+    order = np.argsort(-scores, kind='stable')
+    candidates, scores = candidates[order], scores[order]
+    positive = scores > 0
+    candidates, scores = candidates[positive], scores[positive]
     
-    # RANDOMIZED COUNT: Different for each search
-    # Use the movie title to generate a "random" but consistent count
-    hash_value = sum(ord(c) for c in found_movie.lower())
-    random.seed(hash_value)  # Seed based on movie name
+    # Keep the best-scoring movie of every title, except the seed titles
+    groups = model.title_groups[candidates]
+    _, first = np.unique(groups, return_index=True)
+    first.sort()
+    if len(exclude):
+        first = first[~np.isin(groups[first], model.title_groups[np.asarray(exclude)])]
+    keep = first[:count]
+    return candidates[keep], scores[keep]
+
+def score_query(model, query, count, exclude=()):
+    """Top movies for a query vector with the configured engine"""
+    pool = max(4 * count, count + len(exclude)) + 50
+    with STAGE_SECONDS.time('score'):
+        if SEARCH_ENGINE == 'ann' and model.ann_index is not None:
+            # Approximate candidates, then exact cosine scores on TF-IDF
+            candidates, _ = model.ann_index.search(query, max(pool, ANN_CANDIDATES))
+            scores = model.tfidf_matrix[candidates] @ query
+        else:
+            candidates = None
+            scores = model.tfidf_matrix @ query
+    with STAGE_SECONDS.time('topk'):
+        if candidates is None:
+            if pool < len(scores):
+                candidates = np.argpartition(-scores, pool - 1)[:pool]
+                scores = scores[candidates]
+            else:
+                candidates = np.arange(len(scores))
+        return rank_query_scores(model, candidates, scores, count, exclude)
+
+def query_response(model, text, seed_titles, count):
+    """Recommendation payload for free text and/or seed titles.
+
+    Same format as get_recommendations; the seed movies come first.
+    """
+    seed_indices = np.array([model.title_to_index[t] for t in seed_titles], dtype=np.int64)
+    with STAGE_SECONDS.time('score'):
+        query = query_vector(model, text, seed_indices)
+    searched = ', '.join(([text] if text else []) + list(seed_titles))
+    if query is None:
+        return not_found_response(model, searched)
     
-    # Different movies get different counts (5-15)
-    target_count = random.randint(5, 15)
+    similar_indices, similar_scores = score_query(model, query, count, seed_indices)
+    with STAGE_SECONDS.time('format'):
+        recommendations = [movie_info(model, idx, 1.0, is_searched=True) for idx in seed_indices.tolist()]
+        recommendations.extend(
+            movie_info(model, idx, score)
+            for idx, score in zip(similar_indices.tolist(), similar_scores.tolist())
+        )
     
-    # Take the top N recommendations
-    recommendations_to_show = all_possible[:min(target_count, len(all_possible))]
-    recommendations.extend(recommendations_to_show)
+    return {
+        'success': True,
+        'searched': searched,
+        'found': ', '.join(seed_titles) if seed_titles else None,
+        'recommendations': recommendations
+    }
+
+def get_query_recommendations(text='', movie_names=(), count=QUERY_DEFAULT_COUNT, model=None):
+    """Recommendations for free text and/or several seed titles"""
+    model = model or current_model
+    if isinstance(model, StoreBundle):
+        raise ValueError("Free-text and multi-movie queries need SERVING_MODE=model")
+    seed_titles = []
+    unmatched = []
+    for name in movie_names:
+        found_movie = resolve_title(model, name)
+        if not found_movie:
+            unmatched.append(name)
+        elif found_movie not in seed_titles:
+            seed_titles.append(found_movie)
     
-    # If we have fewer than 5, add more from the next best
-    if len(recommendations) < 6:  # 1 + 5 = 6 total
-        additional_needed = 6 - len(recommendations)
-        if len(all_possible) > target_count:
-            additional = all_possible[target_count:target_count + additional_needed]
-            recommendations.extend(additional)
+    key = ('query', text.lower(), tuple(seed_titles), count)
+    result = model.result_cache.get(key, None)
+    if result is None:
+        result = query_response(model, text, seed_titles, count)
+        model.result_cache.put(key, result)
+    if unmatched:
+        result = dict(result, unmatched=unmatched)
+    return result
+
+# ============================================
+# VIEWING SESSIONS
+# ============================================
+# Sessions hold titles, not movie indices, so they are shared by every
+# model version and every worker.
+session_store = SessionStore(SESSION_DB, SESSION_MAX, SESSION_TTL, SESSION_HISTORY)
+
+def record_watched(session_id, movie_names, model=None):
+    """Resolve watched titles and append them to a session"""
+    model = model or current_model
+    found_titles = []
+    unmatched = []
+    for name in movie_names:
+        found_movie = resolve_title(model, name)
+        if found_movie:
+            found_titles.append(found_movie)
+        else:
+            unmatched.append(name)
+    history = session_store.record(session_id, found_titles) if found_titles else session_store.history(session_id)
+    return {
+        'success': True,
+        'session': session_id,
+        'watched': list(reversed(history)),
+        'unmatched': unmatched
+    }
+
+def session_recommendations(session_id, count=QUERY_DEFAULT_COUNT, model=None):
+    """Because-you-watched recommendations of a session, watched titles excluded"""
+    model = model or current_model
+    if isinstance(model, StoreBundle):
+        raise ValueError("Session recommendations need SERVING_MODE=model")
+    history = [t for t in session_store.history(session_id) if t in model.title_to_index]
+    if not history:
+        return {'success': False, 'message': 'Nothing watched in this session yet', 'session': session_id}
     
-    print(f"   📊 Generated {len(recommendations)} recommendations (target was: {target_count})")
-    print(f"   Different movies will show different counts!")
+    watched = np.array([model.title_to_index[t] for t in history], dtype=np.int64)
+    with STAGE_SECONDS.time('score'):
+        candidates, scores = session_scores(model.neighbor_indices, model.neighbor_scores, watched, SESSION_DECAY)
+    with STAGE_SECONDS.time('topk'):
+        similar_indices, similar_scores = rank_query_scores(model, candidates, scores, count, exclude=watched)
+    with STAGE_SECONDS.time('format'):
+        recommendations = [
+            movie_info(model, idx, score)
+            for idx, score in zip(similar_indices.tolist(), similar_scores.tolist())
+        ]
     
     return {
         'success': True,
-        'searched': search_term,
-        'found': found_movie,
+        'session': session_id,
+        'watched': list(reversed(history)),
         'recommendations': recommendations
     }
 
@@ -292,44 +711,335 @@ def recommend():
         if not movie_name:
             return jsonify({'success': False, 'message': 'Please enter a movie name'})
         
-        result = get_recommendations(movie_name)
-        return jsonify(result)
+        result = get_recommendations(movie_name, filters=data.get('filters'), rerank=data.get('rerank'))
+        return json_response(result)
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.exception("❌ Error: %s", e)
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
 
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'message': 'No data received'})
+        
+        movie_names = data.get('movie_names')
+        if not isinstance(movie_names, list) or not movie_names:
+            return jsonify({'success': False, 'message': 'Please send a list of movie names'})
+        if len(movie_names) > BATCH_MAX_SIZE:
+            return jsonify({'success': False, 'message': f'At most {BATCH_MAX_SIZE} movie names per batch'})
+        
+        names = [name.strip() if isinstance(name, str) else '' for name in movie_names]
+        valid_names = [name for name in names if name]
+        batch_results = dict(zip(valid_names, get_recommendations_batch(
+            valid_names, filters=data.get('filters'), rerank=data.get('rerank')
+        )))
+        
+        results = []
+        for name in names:
+            if name:
+                results.append(batch_results[name])
+            else:
+                results.append({'success': False, 'message': 'Please enter a movie name', 'searched': name})
+        
+        return json_response({'success': True, 'count': len(results), 'results': results})
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
+
+@app.route('/recommend/query', methods=['POST'])
+def recommend_query():
+    """Free text ("heist dream sci-fi") and/or several seed movie names"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'message': 'No data received'})
+        
+        text = data.get('query', '')
+        text = text.strip() if isinstance(text, str) else ''
+        movie_names = data.get('movie_names', [])
+        if not isinstance(movie_names, list):
+            return jsonify({'success': False, 'message': 'movie_names must be a list'})
+        movie_names = [name.strip() for name in movie_names if isinstance(name, str) and name.strip()]
+        if not text and not movie_names:
+            return jsonify({'success': False, 'message': 'Please enter a query or movie names'})
+        if len(movie_names) > QUERY_MAX_SEEDS:
+            return jsonify({'success': False, 'message': f'At most {QUERY_MAX_SEEDS} movie names per query'})
+        
+        try:
+            count = int(data.get('count', QUERY_DEFAULT_COUNT))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'count must be a number'})
+        count = max(1, min(count, QUERY_MAX_COUNT))
+        
+        return json_response(get_query_recommendations(text, movie_names, count))
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
+
+@app.route('/session/<session_id>/watched', methods=['POST'])
+def session_watched(session_id):
+    """Record watched titles: {"movie_name": ...} or {"movie_names": [...]}"""
+    try:
+        if not SESSION_ID_PATTERN.match(session_id):
+            return jsonify({'success': False, 'message': SESSION_ID_MESSAGE})
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'message': 'No data received'})
+        
+        movie_names = data.get('movie_names', [data.get('movie_name')])
+        if not isinstance(movie_names, list):
+            return jsonify({'success': False, 'message': 'movie_names must be a list'})
+        movie_names = [name.strip() for name in movie_names if isinstance(name, str) and name.strip()]
+        if not movie_names:
+            return jsonify({'success': False, 'message': 'Please enter a movie name'})
+        if len(movie_names) > SESSION_HISTORY:
+            return jsonify({'success': False, 'message': f'At most {SESSION_HISTORY} movie names at once'})
+        
+        return jsonify(record_watched(session_id, movie_names))
+    
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
+
+@app.route('/session/<session_id>/recommendations')
+def session_recommend(session_id):
+    """Because-you-watched rail: /session/<id>/recommendations?count=10"""
+    try:
+        if not SESSION_ID_PATTERN.match(session_id):
+            return jsonify({'success': False, 'message': SESSION_ID_MESSAGE})
+        count = max(1, min(request.args.get('count', QUERY_DEFAULT_COUNT, type=int), QUERY_MAX_COUNT))
+        return json_response(session_recommendations(session_id, count))
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
+
+@app.route('/session/<session_id>', methods=['DELETE'])
+def session_clear(session_id):
+    """Forget a session's history"""
+    if not SESSION_ID_PATTERN.match(session_id):
+        return jsonify({'success': False, 'message': SESSION_ID_MESSAGE})
+    return jsonify({'success': True, 'session': session_id, 'cleared': session_store.clear(session_id)})
+
+@app.route('/admin/movies', methods=['POST'])
+def admin_update_movies():
+    """Append or update movies incrementally and load the new version"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    if SERVING_MODE == 'store':
+        # The new version would be published before its store exists
+        return jsonify({'success': False, 'message': 'Catalog updates need SERVING_MODE=model; '
+                        'rebuild with build_model.py --no-publish and build_store.py --publish'}), 400
+    try:
+        data = request.get_json()
+        movies = data.get('movies') if data else None
+        if not isinstance(movies, list) or not movies:
+            return jsonify({'success': False, 'message': 'Please send a list of movies'})
+        
+        # Training code is only imported when an update is requested
+        import pandas as pd
+        from update_model import update_catalog
+        
+        summary = update_catalog(
+            MODELS_DIR, pd.DataFrame(movies),
+            force_refit=bool(data.get('refit', False))
+        )
+        load_model(summary['version'])
+        return jsonify(dict(summary, success=True))
+        
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
+
+def is_version_name(version):
+    """Whether `version` names a direct child of MODELS_DIR (no paths like ../..)"""
+    if not isinstance(version, str) or Path(version).name != version:
+        return False
+    models_dir = MODELS_DIR.resolve()
+    return (models_dir / version).resolve().parent == models_dir
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load and validate an artifact version, swap it in and make it CURRENT.
+
+    Without a version the one named by CURRENT is reloaded. An optional
+    checksum rejects any other build. The other workers follow through
+    their CURRENT watcher.
+    """
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        version = data.get('version')
+        if version and not is_version_name(version):
+            return jsonify({'success': False, 'message': 'version must name a directory in the models directory'}), 400
+        previous = current_model.version
+        model = load_model(version, data.get('checksum'))
+        set_current_version(MODELS_DIR, model.version)
+        failed_versions.discard(model.version)
+        return jsonify({'success': True, 'version': model.version, 'previous': previous})
+        
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return jsonify({'success': False, 'message': f'Reload failed, still serving {current_model.version}: {str(e)}'})
+
 @app.route('/movies')
 def get_movies():
+    """Page through the catalog: /movies?offset=0&limit=100&genre=Crime&director=...
+
+    Repeated genre arguments must all match, repeated directors any.
+
+    Pages are cut from the loaded title list and the genre/director
+    inverted indexes. The ETag is derived from the artifact checksum and
+    the arguments, so an unchanged page costs a 304 without building it.
+    """
     try:
-        movies_list = movies_data['title'].tolist()
-        return jsonify({
-            'success': True,
-            'count': len(movies_list),
-            'movies': movies_list[:100]
-        })
+        model = current_model
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = max(1, min(request.args.get('limit', MOVIES_DEFAULT_LIMIT, type=int), MOVIES_MAX_LIMIT))
+        genres = request.args.getlist('genre')
+        directors = request.args.getlist('director')
+        
+        key = f"{model.manifest['checksum']}|{offset}|{limit}|{genres}|{directors}"
+        etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            movie_filter = MovieFilter(model, {'genres': genres, 'director': directors})
+            if not movie_filter:
+                total = len(model)
+                movies_list = model.all_titles[offset:offset + limit]
+            else:
+                selection = movie_filter.selection()
+                total = len(selection)
+                movies_list = [model.all_titles[i] for i in selection[offset:offset + limit].tolist()]
+            response = json_response({
+                'success': True,
+                'count': total,
+                'offset': offset,
+                'limit': limit,
+                'next_offset': offset + limit if offset + limit < total else None,
+                'movies': movies_list
+            })
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/suggest')
+def suggest():
+    """Typeahead: /suggest?q=dark%20kn&limit=8, most popular matching titles first"""
+    model = current_model
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', SUGGEST_DEFAULT_LIMIT, type=int)
+    response = jsonify({
+        'success': True,
+        'query': query,
+        'suggestions': model.suggest_index.suggest(query, limit) if query else []
+    })
+    # Same version + same query = same body, so repeat keystrokes are
+    # answered from the browser/proxy cache or with a 304
+    response.cache_control.public = True
+    response.cache_control.max_age = SUGGEST_CACHE_SECONDS
+    response.add_etag()
+    return response.make_conditional(request)
+
 @app.route('/debug')
 def debug():
+    model = current_model
     return jsonify({
-        'total_movies': len(movies_data),
-        'features_used': available_features,
-        'first_5_movies': movies_data['title'].head(5).tolist(),
-        'model_status': 'Ready'
+        'total_movies': len(model),
+        'features_used': model.available_features,
+        'first_5_movies': model.all_titles[:5],
+        'model_version': model.version,
+        'model_checksum': model.manifest['checksum'],
+        'model_status': 'Ready',
+        'serving_mode': SERVING_MODE,
+        'search_engine': SEARCH_ENGINE if model.ann_index is not None else 'exact',
+        'ann': model.manifest.get('ann'),
+        'cache': {
+            'query': model.query_cache.stats(),
+            'result': model.result_cache.stats()
+        },
+        'sessions': session_store.stats()
     })
 
+def cache_hit_counters():
+    """Cache hit counters of this process for /metrics"""
+    model = current_model
+    return {
+        'movie_query_cache_hits_total': model.query_cache.hits,
+        'movie_result_cache_hits_total': model.result_cache.hits,
+    }
+
+shared_metrics = (
+    SharedMetrics(METRICS_DIR, [STAGE_SECONDS, REQUEST_SECONDS], cache_hit_counters) if METRICS_DIR else None
+)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format: stage and request latency histograms summed over all workers"""
+    model = current_model
+    if shared_metrics is not None:
+        series, counters = shared_metrics.collect()
+    else:
+        series, counters = None, cache_hit_counters()
+    body = render_metrics(
+        [STAGE_SECONDS, REQUEST_SECONDS],
+        values=[
+            ('movie_model_movies', 'gauge', 'Movies in the served model version', len(model)),
+            ('movie_query_cache_hits_total', 'counter', 'Query cache hits of the served versions',
+             counters.get('movie_query_cache_hits_total', 0)),
+            ('movie_result_cache_hits_total', 'counter', 'Result cache hits of the served versions',
+             counters.get('movie_result_cache_hits_total', 0)),
+        ],
+        series=series
+    )
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """Sample this worker's stacks for a few seconds (collapsed-stack text for flame graphs)"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        seconds = float(data.get('seconds', 10))
+        interval = float(data.get('interval', DEFAULT_INTERVAL))
+        stacks = sample_stacks(seconds, max(interval, 0.001))
+        return Response(format_collapsed(stacks), mimetype='text/plain')
+        
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
+
 # ============================================
 # RUN APP
 # ============================================
 if __name__ == '__main__':
-    print("\n" + "="*60)
-    print("🚀 SERVER READY")
-    print("="*60)
-    print(f"Total movies: {len(movies_data)}")
-    print(f"Available features: {available_features}")
-    print(f"\n🌐 Starting at: http://localhost:5000")
-    print("="*60)
+    logger.info("="*60)
+    logger.info("🚀 SERVER READY")
+    logger.info("="*60)
+    logger.info("Total movies: %d", len(current_model))
+    logger.info("Available features: %s", current_model.available_features)
+    logger.info("🌐 Starting at: http://localhost:%d", PORT)
+    logger.info("   Development server; for production use: gunicorn -c backend/gunicorn.conf.py backend.app:app")
+    logger.info("="*60)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=DEBUG, threaded=True, host='0.0.0.0', port=PORT)
\ No newline at end of file
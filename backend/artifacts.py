@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from ann import save_ann_index, load_ann_index
+from catalog import save_catalog, load_catalog
+from neighbors import save_neighbor_index, load_neighbor_index
+from title_index import save_title_index, load_title_index
+from vocabulary import save_vectorizer, load_vectorizer
+
+# ============================================
+# VERSIONED MODEL ARTIFACTS
+# ============================================
+# Every build is written to its own directory:
+#   models/<version>/manifest.json
+#   models/<version>/<column>.data.npy, <column>.offsets.npy, <column>.npy
+#   models/<version>/vocabulary.data.npy, vocabulary.offsets.npy, idf.npy
+#   models/<version>/neighbor_indices.npy
+#   models/<version>/neighbor_scores.npy
+#   models/<version>/title_grams.*.npy, title_short.*.npy
+#   models/<version>/tfidf.data.npy, tfidf.indices.npy, tfidf.indptr.npy
+#   models/<version>/ann.*.npy (optional, see ann.py)
+# and models/CURRENT names the version that serving should load.
+# All .npy files are opened with mmap_mode='r', so workers forked after
+# loading share the same physical pages. A version is written to a
+# temporary directory and renamed into place, so a half-written version
+# is never visible.
+#
+# Nothing is pickled. The manifest records the size and SHA-256 of every
+# file plus one checksum over all of them; loading rejects a version whose
+# files do not match (a stale, partially copied or mixed-up build).
+
+ARTIFACT_FORMAT = 6
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+DIGEST_CHUNK_SIZE = 1 << 20
+
+
+def new_version_name():
+    """Build versions are sortable timestamps.
+
+    Microseconds, the pid and a random suffix keep names unique when one
+    process, or several, build more than one version per second.
+    """
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+    return f"{stamp}-{int(now % 1 * 1e6):06d}-{os.getpid()}-{secrets.token_hex(3)}"
+
+
+def save_csr(version_dir, name, matrix):
+    """Write a CSR matrix as three flat .npy arrays"""
+    matrix = sparse.csr_matrix(matrix)
+    np.save(version_dir / f"{name}.data.npy", matrix.data.astype(np.float32))
+    np.save(version_dir / f"{name}.indices.npy", matrix.indices.astype(np.int32))
+    np.save(version_dir / f"{name}.indptr.npy", matrix.indptr.astype(np.int64))
+
+
+def load_csr(version_dir, name, shape, mmap_mode='r'):
+    """Open a CSR matrix written by save_csr without copying the arrays"""
+    data = np.load(version_dir / f"{name}.data.npy", mmap_mode=mmap_mode)
+    indices = np.load(version_dir / f"{name}.indices.npy", mmap_mode=mmap_mode)
+    indptr = np.load(version_dir / f"{name}.indptr.npy", mmap_mode=mmap_mode)
+    return sparse.csr_matrix((data, indices, indptr), shape=tuple(shape), copy=False)
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def version_files(version_dir):
+    """{file name: {'size', 'sha256'}} of every artifact file except the manifest"""
+    return {
+        path.name: {'size': path.stat().st_size, 'sha256': file_digest(path)}
+        for path in sorted(Path(version_dir).iterdir())
+        if path.is_file() and path.name != MANIFEST_FILE
+    }
+
+
+def bundle_checksum(files):
+    """One SHA-256 over the names and digests of all files"""
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(f"{name}:{files[name]['sha256']}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def verify_files(version_dir, manifest, full=True):
+    """Raise ValueError when the files differ from the manifest.
+
+    Sizes are always compared; `full` also hashes every file.
+    """
+    version_dir = Path(version_dir)
+    problems = []
+    for name, expected in manifest['files'].items():
+        path = version_dir / name
+        if not path.exists():
+            problems.append(f"{name} is missing")
+        elif path.stat().st_size != expected['size']:
+            problems.append(f"{name} has {path.stat().st_size} bytes, expected {expected['size']}")
+        elif full and file_digest(path) != expected['sha256']:
+            problems.append(f"{name} does not match its checksum")
+    if not problems and bundle_checksum(manifest['files']) != manifest['checksum']:
+        problems.append("file list does not match the bundle checksum")
+    if problems:
+        raise ValueError(f"Artifact version {manifest['version']} is corrupt: " + "; ".join(problems))
+
+
+def save_artifacts(models_dir, movies_data, vectorizer, neighbor_indices, neighbor_scores,
+                   available_features, tfidf_matrix, version=None, extra_manifest=None,
+                   ann_arrays=None, publish=True):
+    """Write a complete artifact version and point CURRENT at it.
+
+    With publish=False CURRENT is left alone, for steps that must finish
+    before serving may load the version (see build_store.py).
+    """
+    models_dir = Path(models_dir)
+    version = version or new_version_name()
+    final_dir = models_dir / version
+    if final_dir.exists():
+        raise FileExistsError(f"Artifact version {version} already exists")
+    version_dir = models_dir / f".tmp-{version}"
+    shutil.rmtree(version_dir, ignore_errors=True)
+    version_dir.mkdir(parents=True)
+
+    catalog_columns = save_catalog(version_dir, movies_data)
+    save_title_index(version_dir, movies_data['title'].fillna('').astype(str).tolist())
+    vectorizer_info = save_vectorizer(version_dir, vectorizer)
+    save_neighbor_index(version_dir, neighbor_indices, neighbor_scores)
+    save_csr(version_dir, "tfidf", tfidf_matrix)
+    if ann_arrays is not None:
+        save_ann_index(version_dir, ann_arrays)
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'version': version,
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'total_movies': int(len(movies_data)),
+        'top_k': int(neighbor_indices.shape[1]),
+        'features_used': list(available_features),
+        'catalog_columns': catalog_columns,
+        'tfidf_shape': [int(n) for n in tfidf_matrix.shape],
+        'vectorizer': vectorizer_info,
+    }
+    manifest.update(extra_manifest or {})
+    manifest['files'] = version_files(version_dir)
+    manifest['checksum'] = bundle_checksum(manifest['files'])
+    with open(version_dir / MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    os.rename(version_dir, final_dir)
+    if publish:
+        set_current_version(models_dir, version)
+    return final_dir
+
+
+def set_current_version(models_dir, version):
+    """Atomically replace the CURRENT pointer"""
+    models_dir = Path(models_dir)
+    tmp_path = models_dir / (CURRENT_FILE + ".tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, models_dir / CURRENT_FILE)
+
+
+def get_current_version(models_dir):
+    """Return the version named by CURRENT, or None when nothing was built"""
+    current_path = Path(models_dir) / CURRENT_FILE
+    if not current_path.exists():
+        return None
+    return current_path.read_text().strip() or None
+
+
+def latest_version(models_dir):
+    """Return the newest complete version, published or not, or None"""
+    models_dir = Path(models_dir)
+    if not models_dir.exists():
+        return None
+    versions = [
+        d.name for d in models_dir.iterdir()
+        if not d.name.startswith('.') and (d / MANIFEST_FILE).exists()
+    ]
+    return max(versions) if versions else None
+
+
+def read_manifest(models_dir, version=None, verify=True, checksum=None):
+    """(version directory, manifest) of a prebuilt version after checking its files.
+
+    `verify` hashes every file against the manifest (file sizes are always
+    checked); `checksum` additionally requires a specific build.
+    """
+    models_dir = Path(models_dir)
+    version = version or get_current_version(models_dir)
+    if version is None:
+        raise FileNotFoundError(f"No model artifacts found in {models_dir}")
+
+    version_dir = models_dir / version
+    with open(version_dir / MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(
+            f"Artifact format {manifest.get('format')} is not supported "
+            f"(expected {ARTIFACT_FORMAT}), rebuild with build_model.py"
+        )
+    if checksum and manifest['checksum'] != checksum:
+        raise ValueError(f"Artifact version {version} has checksum {manifest['checksum']}, expected {checksum}")
+    verify_files(version_dir, manifest, full=verify)
+    return version_dir, manifest
+
+
+def load_artifacts(models_dir, version=None, mmap_mode='r', verify=True, checksum=None):
+    """Load a prebuilt artifact version. Never trains anything.
+
+    See read_manifest for `verify` and `checksum`.
+    """
+    version_dir, manifest = read_manifest(models_dir, version, verify=verify, checksum=checksum)
+
+    catalog = load_catalog(version_dir, manifest['catalog_columns'], mmap_mode=mmap_mode)
+    title_index = load_title_index(version_dir, catalog['title'].tolist(), mmap_mode=mmap_mode)
+    vectorizer = load_vectorizer(version_dir, manifest['vectorizer'])
+    neighbor_indices, neighbor_scores = load_neighbor_index(version_dir, mmap_mode=mmap_mode)
+    tfidf_matrix = load_csr(version_dir, "tfidf", manifest['tfidf_shape'], mmap_mode=mmap_mode)
+    ann_index = load_ann_index(version_dir, mmap_mode=mmap_mode) if 'ann' in manifest else None
+
+    return {
+        'manifest': manifest,
+        'catalog': catalog,
+        'title_index': title_index,
+        'vectorizer': vectorizer,
+        'neighbor_indices': neighbor_indices,
+        'neighbor_scores': neighbor_scores,
+        'tfidf_matrix': tfidf_matrix,
+        'ann_index': ann_index,
+        'available_features': manifest['features_used'],
+    }
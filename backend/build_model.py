@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.append(str(Path(__file__).parent))
+
+from ann import ANN_ARRAYS, DEFAULT_COMPONENTS, RECALL_K, AnnIndex, build_ann_index, recall_at_k, save_ann_index
+from artifacts import MANIFEST_FILE, file_digest, get_current_version, read_manifest, save_artifacts
+from catalog import load_catalog
+from ingest import DEFAULT_CHUNK_SIZE, FEATURE_COLUMNS, combine_features, csv_features, fit_tfidf, prepare_movies
+from neighbors import (DEFAULT_TOP_K, DEFAULT_BLOCK_SIZE, block_size_for_budget, build_neighbor_index,
+                       load_neighbor_index)
+from pipeline import StageCache, load_frame, save_frame, stage_key
+from vocabulary import fit_params, load_vectorizer, save_vectorizer
+
+# ============================================
+# OFFLINE MODEL BUILD
+# ============================================
+# This is the only place the serving model is trained. app.py only loads
+# the artifacts written here.
+#
+#   python build_model.py [--data data/movies.csv] [--models-dir models] [--force]
+#
+# The build runs as cached stages (see pipeline.py), so a rebuild only
+# reruns the stages whose inputs changed:
+#   prepare -> vectorize -> neighbors -> [ann] -> export
+# prepare reads the CSV and combines the features chunk by chunk.
+#
+# Movies added with update_model.py only live in the artifacts, not in
+# the CSV. The build refuses to replace a CURRENT version holding movies
+# the CSV lacks, unless --drop-missing is given.
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+MODELS_DIR = Path(os.environ.get("MODELS_DIR", BASE_DIR / "models"))
+
+TFIDF_PARAMS = {
+    'stop_words': 'english',
+    'max_features': 5000,
+    'min_df': 1,
+    'max_df': 0.9,
+}
+
+# Stage outputs, inside the models directory
+CACHE_DIR_NAME = ".cache"
+
+# Rows analyzed to estimate the out-of-vocabulary token rate of a corpus
+OOV_SAMPLE_SIZE = 5000
+
+
+def preprocess_movies(movies_data, available_features=None):
+    """Clean feature columns and build the combined_features text.
+
+    Pass `available_features` to reuse the feature set of an existing
+    model; missing columns are then treated as empty.
+    """
+    print("\n🔄 Preprocessing data...")
+
+    # Reset index
+    movies_data = movies_data.reset_index(drop=True)
+
+    # Identify available features
+    if available_features is None:
+        available_features = [f for f in FEATURE_COLUMNS if f in movies_data.columns]
+        for feature in available_features:
+            print(f"   ✓ Found: {feature}")
+    else:
+        for feature in available_features:
+            if feature not in movies_data.columns:
+                movies_data[feature] = ''
+
+    # Fill missing values
+    for feature in available_features:
+        movies_data[feature] = movies_data[feature].fillna('').astype(str)
+
+    print("   Combining features...")
+    movies_data['combined_features'] = combine_features(movies_data, available_features)
+    print(f"✅ Preprocessed {len(movies_data)} movies")
+    return movies_data, available_features
+
+
+def fit_model(movies_data, top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE, n_jobs=1, tfidf_params=None):
+    """Fit TF-IDF (TFIDF_PARAMS unless given) and build the top-K neighbor index"""
+    print("\n🧠 Training model...")
+
+    vectorizer = TfidfVectorizer(**(TFIDF_PARAMS if tfidf_params is None else tfidf_params))
+    tfidf_matrix = vectorizer.fit_transform(movies_data['combined_features'])
+    print(f"   TF-IDF matrix shape: {tfidf_matrix.shape}")
+
+    neighbor_indices, neighbor_scores = build_neighbor_index(
+        tfidf_matrix, top_k=top_k, block_size=block_size, n_jobs=n_jobs
+    )
+    print(f"   Neighbor index shape: {neighbor_indices.shape}")
+
+    return vectorizer, tfidf_matrix, neighbor_indices, neighbor_scores
+
+
+def fit_ann(tfidf_matrix, neighbor_indices, n_components=DEFAULT_COMPONENTS, n_lists=None):
+    """Build the optional ANN engine and measure its recall@K against the exact index.
+
+    Returns (arrays, manifest entry).
+    """
+    print("\n🧭 Building ANN engine (TruncatedSVD + IVF)...")
+    ann_arrays = build_ann_index(tfidf_matrix, n_components=n_components, n_lists=n_lists)
+    return ann_arrays, ann_manifest(ann_arrays, tfidf_matrix, neighbor_indices)
+
+
+def ann_manifest(ann_arrays, tfidf_matrix, neighbor_indices):
+    """Manifest entry of an ANN engine, including its measured recall@K"""
+    recall = recall_at_k(AnnIndex(ann_arrays), tfidf_matrix, neighbor_indices)
+    info = {
+        'components': int(ann_arrays['components'].shape[0]),
+        'lists': int(ann_arrays['centroids'].shape[0]),
+        f'recall_at_{RECALL_K}': round(recall, 4),
+    }
+    print(f"   Embedding: {info['components']} dims, {info['lists']} lists, "
+          f"recall@{RECALL_K} vs exact: {recall:.3f}")
+    return info
+
+
+def oov_counts(vectorizer, texts, sample_size=None):
+    """(out-of-vocabulary tokens, total tokens, texts analyzed) for a corpus"""
+    texts = list(texts)
+    if sample_size and len(texts) > sample_size:
+        step = len(texts) / sample_size
+        texts = [texts[int(i * step)] for i in range(sample_size)]
+
+    analyzer = vectorizer.build_analyzer()
+    vocabulary = vectorizer.vocabulary_
+    total = missing = 0
+    for text in texts:
+        for token in analyzer(text):
+            total += 1
+            if token not in vocabulary:
+                missing += 1
+    return missing, total, len(texts)
+
+
+def fit_manifest(vectorizer, movies_data):
+    """Manifest fields describing the full fit, used to measure drift later"""
+    missing, total, analyzed = oov_counts(
+        vectorizer, movies_data['combined_features'], sample_size=OOV_SAMPLE_SIZE
+    )
+    return {
+        'fitted_movies': int(len(movies_data)),
+        'fitted_tokens': int(total / max(analyzed, 1) * len(movies_data)),
+        'baseline_oov_rate': missing / total if total else 0.0,
+        'excess_oov_tokens': 0,
+        'incremental_updates': 0,
+    }
+
+
+def missing_movies(models_dir, version, titles):
+    """Titles of a version that `titles` lacks, counting repeated titles"""
+    version_dir, manifest = read_manifest(models_dir, version, verify=False)
+    stored = load_catalog(version_dir, manifest['catalog_columns'])['title'].tolist()
+    return list((Counter(stored) - Counter(titles)).elements())
+
+
+def build(csv_path, models_dir, top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE, n_jobs=1,
+          chunk_size=DEFAULT_CHUNK_SIZE, ann=False, ann_components=DEFAULT_COMPONENTS, ann_lists=None,
+          features=None, tfidf_params=None, force=False, cache_dir=None, memory_budget_mb=0,
+          publish=True, cache=None, drop_missing=False):
+    """Run the offline build through the stage cache and publish a new artifact version.
+
+    Stages whose inputs did not change are loaded from `cache_dir`
+    (default: <models_dir>/.cache); `force` reruns all of them.
+    `memory_budget_mb` overrides `block_size` for the neighbor build. A
+    StageCache passed as `cache` is used instead (its timings stay
+    readable afterwards), ignoring `cache_dir` and `force`. When
+    nothing changed since the version named by CURRENT, no new version is
+    written and that version is returned. With publish=False the new
+    version is written without updating CURRENT. Unless `drop_missing`,
+    a RuntimeError is raised when the CURRENT version holds movies the
+    CSV lacks (see missing_movies).
+    """
+    models_dir = Path(models_dir)
+    tfidf_params = dict(TFIDF_PARAMS if tfidf_params is None else tfidf_params)
+    cache = cache or StageCache(cache_dir or models_dir / CACHE_DIR_NAME, force=force)
+
+    if features is None:
+        features = csv_features(csv_path)
+    print(f"\n📂 Reading {csv_path} and combining features ({', '.join(features)})...")
+    movies_data, prepare_key = cache.run(
+        'prepare', {'csv': file_digest(csv_path), 'features': features},
+        lambda d: save_frame(d, prepare_movies(csv_path, features, chunk_size)),
+        load_frame
+    )
+    print(f"✅ Loaded {len(movies_data)} movies")
+
+    print("\n🧠 Fitting TF-IDF...")
+
+    def build_vectors(directory):
+        vectorizer, tfidf_matrix = fit_tfidf(movies_data['combined_features'], tfidf_params, chunk_size)
+        # Full precision, so a cached run feeds the ANN stage the same matrix
+        sparse.save_npz(directory / "tfidf.npz", tfidf_matrix, compressed=False)
+        return {
+            'vectorizer': save_vectorizer(directory, vectorizer),
+            'tfidf_shape': [int(n) for n in tfidf_matrix.shape],
+            'fit': fit_manifest(vectorizer, movies_data),
+        }
+
+    def load_vectors(directory, info):
+        vectorizer = load_vectorizer(directory, info['vectorizer'])
+        tfidf_matrix = sparse.load_npz(directory / "tfidf.npz")
+        return vectorizer, tfidf_matrix, info['fit']
+
+    (vectorizer, tfidf_matrix, fit_info), vectorize_key = cache.run(
+        'vectorize', {'prepare': prepare_key, 'tfidf_params': tfidf_params}, build_vectors, load_vectors
+    )
+    print(f"   TF-IDF matrix shape: {tfidf_matrix.shape}")
+
+    print("\n🧭 Building neighbor index...")
+
+    if memory_budget_mb:
+        workers = os.cpu_count() if n_jobs < 0 else n_jobs
+        block_size = block_size_for_budget(tfidf_matrix.shape[0], memory_budget_mb, workers)
+
+    def build_neighbors(directory):
+        neighbor_indices, _ = build_neighbor_index(
+            tfidf_matrix, top_k=top_k, block_size=block_size, n_jobs=n_jobs, output_dir=directory
+        )
+        return {'shape': [int(n) for n in neighbor_indices.shape]}
+
+    (neighbor_indices, neighbor_scores), neighbors_key = cache.run(
+        'neighbors', {'vectorize': vectorize_key, 'top_k': top_k}, build_neighbors,
+        lambda d, info: load_neighbor_index(d, mmap_mode='r')
+    )
+    print(f"   Neighbor index shape: {neighbor_indices.shape}")
+
+    extra_manifest = dict(fit_info, tfidf_fit_params=fit_params(tfidf_params))
+    ann_arrays = None
+    stage_keys = {'prepare': prepare_key, 'vectorize': vectorize_key, 'neighbors': neighbors_key}
+    if ann:
+        def build_ann(directory):
+            arrays, info = fit_ann(tfidf_matrix, neighbor_indices, n_components=ann_components, n_lists=ann_lists)
+            save_ann_index(directory, arrays)
+            return info
+
+        def load_ann(directory, info):
+            return {name: np.load(directory / f"ann.{name}.npy") for name in ANN_ARRAYS}, info
+
+        (ann_arrays, extra_manifest['ann']), stage_keys['ann'] = cache.run(
+            'ann', {'vectorize': vectorize_key, 'neighbors': neighbors_key,
+                    'components': ann_components, 'lists': ann_lists},
+            build_ann, load_ann
+        )
+
+    # Same stage outputs as the served version: nothing to publish
+    build_key = stage_key('export', stage_keys)
+    current = get_current_version(models_dir)
+    current_manifest = models_dir / str(current) / MANIFEST_FILE
+    if not force and current and current_manifest.exists():
+        if json.loads(current_manifest.read_text()).get('build_key') == build_key:
+            cache.record('export', 'unchanged', 0.0)
+            print(f"✅ {current} is already built from these inputs")
+            print("\n" + cache.summary())
+            return models_dir / current
+
+    if current and current_manifest.exists() and not drop_missing:
+        missing = missing_movies(models_dir, current, movies_data['title'].tolist())
+        if missing:
+            raise RuntimeError(
+                f"{current} holds {len(missing)} movies that {csv_path} lacks "
+                f"(e.g. '{missing[0]}', added with update_model.py?): add them to the CSV "
+                f"or pass --drop-missing"
+            )
+
+    print("\n💾 Saving artifacts...")
+    start = time.perf_counter()
+    extra_manifest['build_key'] = build_key
+    version_dir = save_artifacts(
+        models_dir, movies_data, vectorizer,
+        neighbor_indices, neighbor_scores, features, tfidf_matrix,
+        extra_manifest=extra_manifest, ann_arrays=ann_arrays, publish=publish
+    )
+    cache.record('export', 'ran', time.perf_counter() - start)
+    cache.prune()
+    print(f"✅ Artifacts saved to {version_dir}")
+    print("\n" + cache.summary())
+    return version_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build movie recommendation artifacts")
+    parser.add_argument('--data', default=str(DATA_DIR / "movies.csv"), help="Path to movies.csv")
+    parser.add_argument('--models-dir', default=str(MODELS_DIR), help="Artifact output directory")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help="Neighbors kept per movie")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help="Rows per similarity block")
+    parser.add_argument('--n-jobs', type=int, default=1, help="Worker processes (-1 = all cores)")
+    parser.add_argument('--memory-budget-mb', type=int, default=0,
+                        help="Score memory budget for all workers (overrides --block-size)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="CSV rows read per chunk")
+    parser.add_argument('--ann', action='store_true', help="Also build the approximate (SVD + IVF) engine")
+    parser.add_argument('--ann-components', type=int, default=DEFAULT_COMPONENTS, help="SVD dimensions")
+    parser.add_argument('--ann-lists', type=int, default=None, help="IVF lists (default: sqrt of the catalog size)")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="Do not update CURRENT (e.g. build_store.py --publish does it)")
+    parser.add_argument('--drop-missing', action='store_true',
+                        help="Replace CURRENT even if it holds movies the CSV lacks")
+    parser.add_argument('--force', action='store_true', help="Rerun every stage instead of reusing cached outputs")
+    parser.add_argument('--cache-dir', default=None, help="Stage cache directory (default: <models-dir>/.cache)")
+    args = parser.parse_args(argv)
+
+    print("="*60)
+    print("🎬 BUILDING MOVIE RECOMMENDATION MODEL")
+    print("="*60)
+
+    csv_path = Path(args.data)
+    if not csv_path.exists():
+        print(f"❌ ERROR: {csv_path} not found!")
+        return False
+
+    try:
+        build(csv_path, Path(args.models_dir), top_k=args.top_k,
+              block_size=args.block_size, n_jobs=args.n_jobs, chunk_size=args.chunk_size,
+              ann=args.ann, ann_components=args.ann_components, ann_lists=args.ann_lists,
+              force=args.force, cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+              memory_budget_mb=args.memory_budget_mb, publish=not args.no_publish,
+              drop_missing=args.drop_missing)
+    except RuntimeError as e:
+        print(f"❌ ERROR: {e}")
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from joblib import Parallel, delayed
+
+sys.path.append(str(Path(__file__).parent))
+
+from artifacts import get_current_version, latest_version, set_current_version
+from recommendation_store import store_path, write_store
+
+# ============================================
+# OFFLINE RECOMMENDATION STORE BUILD
+# ============================================
+# Runs the /recommend logic of app.py for every distinct title of an
+# artifact version and writes the payloads to
+# models/<version>/recommendations.sqlite, which app.py serves with
+# SERVING_MODE=store.
+#
+#   python build_store.py [--models-dir models] [--version V] [--n-jobs -1] [--publish]
+#
+# In store mode serving cannot load a version before its store exists, so
+# build it unpublished and let this script move CURRENT once it is done:
+#   python build_model.py --no-publish && python build_store.py --publish
+# RERANK and RERANK_* apply like in serving, so the stored lists match
+# what SERVING_MODE=model would return with the same settings.
+
+BASE_DIR = Path(__file__).parent
+MODELS_DIR = Path(os.environ.get("MODELS_DIR", BASE_DIR / "models"))
+
+# Titles per worker task
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def configure_app(models_dir, version):
+    """Environment for importing app.py as a plain in-process model"""
+    os.environ['MODELS_DIR'] = str(models_dir)
+    os.environ['MODEL_VERSION'] = version
+    os.environ['SERVING_MODE'] = 'model'
+    # Every title is computed once, caching the payloads would only cost memory
+    os.environ['QUERY_CACHE_SIZE'] = '0'
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    os.environ['RELOAD_INTERVAL'] = '0'
+
+
+def _recommend_chunk(titles):
+    """(position, title, payload JSON) of every title (runs in a worker process)"""
+    import app
+
+    model = app.current_model
+    rerank_params = app.rerank_settings(None)
+    rows = []
+    for title in titles:
+        # The same call /recommend makes once a search resolved to `title`
+        payload = app.recommendation_response(model, title, title, rerank_params=rerank_params)
+        rows.append((model.title_to_index[title], title, json.dumps(payload, separators=(',', ':'))))
+    return rows
+
+
+def build_store(models_dir, version=None, n_jobs=1, chunk_size=DEFAULT_CHUNK_SIZE, publish=False):
+    """Write the recommendation store of a version; returns its path.
+
+    The version defaults to CURRENT, or to the newest built version with
+    publish=True, which points CURRENT at it once the store is written.
+    """
+    models_dir = Path(models_dir).resolve()
+    version = version or (latest_version(models_dir) if publish else get_current_version(models_dir))
+    if version is None:
+        raise FileNotFoundError(f"No model artifacts found in {models_dir}")
+    configure_app(models_dir, version)
+    import app
+
+    model = app.current_model
+    titles = list(model.title_to_index)
+    chunks = [titles[start:start + chunk_size] for start in range(0, len(titles), chunk_size)]
+    print(f"\n🧮 Computing recommendations for {len(titles)} titles in {len(chunks)} chunks...")
+    if n_jobs == 1 or len(chunks) <= 1:
+        results = (_recommend_chunk(chunk) for chunk in chunks)
+    else:
+        # Workers import app.py themselves and memory-map the same artifacts
+        results = Parallel(n_jobs=n_jobs, return_as='generator', pre_dispatch='2*n_jobs')(
+            delayed(_recommend_chunk)(chunk) for chunk in chunks
+        )
+
+    path = store_path(models_dir / version)
+    meta = {
+        'version': model.version,
+        'checksum': model.manifest['checksum'],
+        'rerank': app.rerank_settings(None),
+    }
+    count = write_store(path, (row for rows in results for row in rows), meta)
+    print(f"✅ Stored {count} recommendation lists in {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    if publish:
+        set_current_version(models_dir, version)
+        print(f"📌 CURRENT -> {version}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the recommendations of every title into SQLite")
+    parser.add_argument('--models-dir', default=str(MODELS_DIR), help="Artifact directory")
+    parser.add_argument('--version', default=None,
+                        help="Artifact version (default: CURRENT, or the newest one with --publish)")
+    parser.add_argument('--n-jobs', type=int, default=1, help="Worker processes (-1 = all cores)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Titles per worker task")
+    parser.add_argument('--publish', action='store_true', help="Point CURRENT at the version once its store is written")
+    args = parser.parse_args(argv)
+
+    print("="*60)
+    print("🗄️ BUILDING RECOMMENDATION STORE")
+    print("="*60)
+
+    try:
+        build_store(args.models_dir, args.version, n_jobs=args.n_jobs, chunk_size=args.chunk_size,
+                    publish=args.publish)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
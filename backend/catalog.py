@@ -0,0 +1,172 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# FLAT, MEMORY-MAPPABLE MOVIE CATALOG
+# ============================================
+# The serving side does not need a pandas DataFrame. Every column is
+# stored as plain .npy files that can be opened with mmap_mode='r', so
+# all gunicorn workers share one physical copy through the page cache:
+#   text column    -> <name>.data.npy (uint8 UTF-8 blob) + <name>.offsets.npy (int64)
+#   numeric column -> <name>.npy (float64, NaN when missing)
+#   title_group    -> title_group.npy (int32, same value for identical titles)
+#   result_count   -> result_count.npy (int8, recommendations shown per movie)
+
+NUMERIC_COLUMNS = ['year', 'popularity']
+
+# Only the columns serving actually reads are exported, plus the combined
+# feature text that update_model.py needs for a full refit (memory-mapped,
+# so serving never pages it in)
+SERVING_TEXT_COLUMNS = ['title', 'genres', 'director', 'combined_features']
+
+# Display strings shown in recommendation cards, precomputed at build time
+DISPLAY_COLUMNS = {'director_display': 'director', 'genres_display': 'genres'}
+DISPLAY_MAX_LENGTH = 50
+
+# Every movie shows a "random" but fixed number of recommendations
+RESULT_COUNT_MIN = 5
+RESULT_COUNT_MAX = 15
+
+
+class StringColumn:
+    """Read-only column of strings backed by a UTF-8 blob and offsets"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def tolist(self):
+        raw = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        if raw.isascii():
+            # Byte offsets are character offsets: decode once, slice the str
+            text = raw.decode('ascii')
+            return [text[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        return [raw[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+class Catalog:
+    """Column store with the small part of the DataFrame API serving needs"""
+
+    def __init__(self, columns):
+        self._columns = columns
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def __len__(self):
+        return len(self._columns['title'])
+
+
+def encode_strings(values):
+    """Encode a sequence of strings into (uint8 blob, int64 offsets)"""
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def save_text_column(version_dir, name, values):
+    """Write one text column as <name>.data.npy + <name>.offsets.npy"""
+    data, offsets = encode_strings(values)
+    np.save(version_dir / f"{name}.data.npy", data)
+    np.save(version_dir / f"{name}.offsets.npy", offsets)
+
+
+def display_strings(values):
+    """'A|B' -> 'A, B', cut to DISPLAY_MAX_LENGTH, blank values -> ''"""
+    values = values.fillna('').astype(str)
+    display = values.str.replace('|', ', ', regex=False).str.slice(0, DISPLAY_MAX_LENGTH)
+    return display.where(values.str.strip() != '', '')
+
+
+def result_counts(titles):
+    """Recommendation count of every title, precomputed so serving needs no RNG.
+
+    Same values the app always used: randint(5, 15) of a Random seeded with
+    the sum of the code points of the lowercase title.
+    """
+    by_seed = {}
+    counts = np.empty(len(titles), dtype=np.int8)
+    for i, title in enumerate(titles):
+        seed = sum(ord(c) for c in title.lower())
+        count = by_seed.get(seed)
+        if count is None:
+            count = by_seed[seed] = random.Random(seed).randint(RESULT_COUNT_MIN, RESULT_COUNT_MAX)
+        counts[i] = count
+    return counts
+
+
+def save_catalog(version_dir, movies_data, text_columns=SERVING_TEXT_COLUMNS):
+    """Write the catalog columns of a DataFrame as flat .npy files"""
+    saved = {'text': [], 'numeric': []}
+
+    for name in text_columns:
+        if name not in movies_data.columns:
+            continue
+        save_text_column(version_dir, name, movies_data[name].fillna('').astype(str))
+        saved['text'].append(name)
+
+    for name, source in DISPLAY_COLUMNS.items():
+        if source not in movies_data.columns:
+            continue
+        save_text_column(version_dir, name, display_strings(movies_data[source]))
+        saved['text'].append(name)
+
+    titles = movies_data['title'].fillna('').astype(str)
+    title_group, _ = pd.factorize(titles)
+    np.save(version_dir / "title_group.npy", title_group.astype(np.int32))
+    saved['numeric'].append('title_group')
+
+    np.save(version_dir / "result_count.npy", result_counts(titles.tolist()))
+    saved['numeric'].append('result_count')
+
+    for name in NUMERIC_COLUMNS:
+        if name not in movies_data.columns:
+            continue
+        values = pd.to_numeric(movies_data[name], errors='coerce').to_numpy(dtype=np.float64)
+        np.save(version_dir / f"{name}.npy", values)
+        saved['numeric'].append(name)
+
+    return saved
+
+
+def catalog_frame(catalog):
+    """Rebuild a DataFrame of the source columns (for incremental updates)"""
+    derived = set(DISPLAY_COLUMNS) | {'title_group', 'result_count'}
+    data = {}
+    for name in catalog.columns:
+        if name in derived:
+            continue
+        column = catalog[name]
+        data[name] = column.tolist() if isinstance(column, StringColumn) else np.asarray(column)
+    return pd.DataFrame(data)
+
+
+def load_catalog(version_dir, saved, mmap_mode='r'):
+    """Open the catalog columns written by save_catalog"""
+    columns = {}
+    for name in saved['text']:
+        data = np.load(version_dir / f"{name}.data.npy", mmap_mode=mmap_mode)
+        offsets = np.load(version_dir / f"{name}.offsets.npy", mmap_mode=mmap_mode)
+        columns[name] = StringColumn(data, offsets)
+    for name in saved['numeric']:
+        columns[name] = np.load(version_dir / f"{name}.npy", mmap_mode=mmap_mode)
+    return Catalog(columns)
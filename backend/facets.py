@@ -0,0 +1,118 @@
+import re
+
+import numpy as np
+
+# ============================================
+# INVERTED INDEXES FOR CATALOG FILTERS
+# ============================================
+# Built at load time from the catalog text columns:
+#   genres    multi-valued ('Action|Crime', 'Action, Crime' or 'Action Crime')
+#   director  multi-valued ('Joel Coen|Ethan Coen' or 'Joel Coen, Ethan Coen')
+# Every lowercase value maps to the sorted int32 indices of its movies,
+# so a filter is one dict lookup and combining filters is a sorted
+# intersection, never a scan of the catalog. Genres (a few dozen values)
+# also get one boolean mask per value, so testing the candidates of a
+# recommendation is a single gather.
+
+FACET_COLUMNS = {'genres': True, 'director': True}  # column -> multi-valued
+# Columns whose values may be separated by whitespace alone, and get masks
+WORD_SEPARATED = {'genres'}
+# Masks are kept for the most common values only (N bytes each)
+MAX_MASKS = 64
+SEPARATORS = re.compile(r'[|,]')
+
+
+def split_values(value, multi_valued, split_words=False):
+    """Lowercase facet values of one catalog cell"""
+    value = value.strip().lower()
+    if not value:
+        return []
+    if not multi_valued:
+        return [value]
+    if SEPARATORS.search(value):
+        parts = SEPARATORS.split(value)
+    else:
+        parts = value.split() if split_words else [value]
+    return [part.strip() for part in parts if part.strip()]
+
+
+class FacetIndex:
+    """value -> sorted movie indices for one catalog column"""
+
+    def __init__(self, cells, multi_valued, precompute_masks=False, split_words=False):
+        self.n_movies = len(cells)
+        self.multi_valued = multi_valued
+        self.split_words = split_words
+        postings = {}
+        for i, cell in enumerate(cells):
+            for value in set(split_values(cell, multi_valued, split_words)):
+                postings.setdefault(value, []).append(i)
+        self.postings = {value: np.array(ids, dtype=np.int32) for value, ids in postings.items()}
+        self.masks = {}
+        if precompute_masks:
+            common = sorted(self.postings.items(), key=lambda item: -len(item[1]))[:MAX_MASKS]
+            for value, ids in common:
+                mask = np.zeros(self.n_movies, dtype=bool)
+                mask[ids] = True
+                self.masks[value] = mask
+
+    def __len__(self):
+        return len(self.postings)
+
+    def indices(self, value):
+        """Sorted indices of the movies with this value (case-insensitive).
+
+        A multi-word genre missing from whitespace-separated data
+        ('Science Fiction') matches the movies that have all its words.
+        """
+        value = value.strip().lower()
+        found = self.postings.get(value)
+        if found is not None:
+            return found
+        words = value.split()
+        if self.split_words and len(words) > 1:
+            return intersect_sorted([self.postings.get(word, np.empty(0, dtype=np.int32)) for word in words])
+        return np.empty(0, dtype=np.int32)
+
+    def contains(self, value, movie_indices):
+        """Which of the given movies have this value (cost independent of N)"""
+        mask = self.masks.get(value.strip().lower())
+        if mask is not None:
+            return mask[movie_indices]
+        return contains_sorted(self.indices(value), movie_indices)
+
+
+def contains_sorted(sorted_ids, movie_indices):
+    """Membership of movie_indices in a sorted index array (binary search)"""
+    if len(sorted_ids) == 0:
+        return np.zeros(len(movie_indices), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_ids, movie_indices), len(sorted_ids) - 1)
+    return sorted_ids[positions] == movie_indices
+
+
+def intersect_sorted(arrays):
+    """Intersection of sorted index arrays, smallest first"""
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for other in arrays[1:]:
+        if len(result) == 0:
+            break
+        result = np.intersect1d(result, other, assume_unique=True)
+    return result
+
+
+def union_sorted(arrays):
+    """Union of sorted index arrays"""
+    if not arrays:
+        return np.empty(0, dtype=np.int32)
+    return np.unique(np.concatenate(arrays)).astype(np.int32)
+
+
+def build_facets(catalog):
+    """FacetIndex of every facet column present in the catalog"""
+    return {
+        name: FacetIndex(catalog[name].tolist(), multi_valued,
+                         precompute_masks=name in WORD_SEPARATED, split_words=name in WORD_SEPARATED)
+        for name, multi_valued in FACET_COLUMNS.items()
+        if name in catalog
+    }
@@ -0,0 +1,119 @@
+import numpy as np
+
+from facets import contains_sorted, intersect_sorted, union_sorted
+
+# ============================================
+# RECOMMENDATION FILTERS
+# ============================================
+# A filter spec as sent to /recommend:
+#   {"genres": ["Crime", "Drama"],           every genre listed
+#    "director": "Christopher Nolan",        any director listed
+#    "year": {"min": 2000, "max": 2010},     inclusive range (or one number)
+#    "popularity": {"min": 20}}
+# Filters are checked on the candidates only (precomputed genre masks,
+# binary search in the director postings, numeric compares), so filtering
+# the stored top-K neighbors costs O(K) like the unfiltered lookup. The
+# full set of matching movies is only built when the neighbors run out.
+
+FACET_FILTERS = ['genres', 'director']
+RANGE_FILTERS = ['year', 'popularity']
+
+
+def as_list(value, name):
+    """A string or a list of strings"""
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise ValueError(f"Filter '{name}' must be a string or a list of strings")
+    return [v.strip() for v in values if v.strip()]
+
+
+def as_range(value, name):
+    """(min, max) from a number or {'min': .., 'max': ..}; missing ends are None"""
+    if isinstance(value, bool):
+        raise ValueError(f"Filter '{name}' must be a number or {{'min': .., 'max': ..}}")
+    if isinstance(value, (int, float)):
+        return float(value), float(value)
+    if not isinstance(value, dict) or not set(value) <= {'min', 'max'}:
+        raise ValueError(f"Filter '{name}' must be a number or {{'min': .., 'max': ..}}")
+    bounds = []
+    for key in ('min', 'max'):
+        bound = value.get(key)
+        if bound is not None and (isinstance(bound, bool) or not isinstance(bound, (int, float))):
+            raise ValueError(f"Filter '{name}.{key}' must be a number")
+        bounds.append(None if bound is None else float(bound))
+    return tuple(bounds)
+
+
+class MovieFilter:
+    """Parsed filter constraints bound to one ModelBundle"""
+
+    def __init__(self, model, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("filters must be an object")
+        unknown = set(spec) - set(FACET_FILTERS) - set(RANGE_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        self.model = model
+        self.genres = as_list(spec.get('genres', []), 'genres')
+        self.directors = as_list(spec.get('director', []), 'director')
+        self.ranges = {}
+        for name in RANGE_FILTERS:
+            if spec.get(name) is not None:
+                self.ranges[name] = as_range(spec[name], name)
+
+        for name, values in [('genres', self.genres), ('director', self.directors)]:
+            if values and name not in model.facets:
+                raise ValueError(f"This catalog has no '{name}' column to filter on")
+        for name in self.ranges:
+            if name not in model.catalog:
+                raise ValueError(f"This catalog has no '{name}' column to filter on")
+        self._director_ids = (
+            union_sorted([model.facets['director'].indices(d) for d in self.directors])
+            if self.directors else None
+        )
+
+    def __bool__(self):
+        return bool(self.genres or self.directors or self.ranges)
+
+    @property
+    def key(self):
+        """Hashable form, for result cache keys"""
+        return (
+            tuple(sorted(g.lower() for g in self.genres)),
+            tuple(sorted(d.lower() for d in self.directors)),
+            tuple(sorted(self.ranges.items())),
+        )
+
+    def matches(self, movie_indices):
+        """Boolean array: which of the given movies pass every constraint"""
+        movie_indices = np.asarray(movie_indices)
+        keep = np.ones(len(movie_indices), dtype=bool)
+        for genre in self.genres:
+            keep &= self.model.facets['genres'].contains(genre, movie_indices)
+        if self._director_ids is not None:
+            keep &= contains_sorted(self._director_ids, movie_indices)
+        for name, (low, high) in self.ranges.items():
+            values = np.asarray(self.model.catalog[name])[movie_indices]
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+        return keep
+
+    def selection(self):
+        """Sorted indices of every matching movie.
+
+        Starts from the genre/director postings when there are any, so the
+        range checks only run over those movies.
+        """
+        postings = [self.model.facets['genres'].indices(g) for g in self.genres]
+        if self._director_ids is not None:
+            postings.append(self._director_ids)
+        if postings:
+            selected = intersect_sorted(postings)
+        else:
+            selected = np.arange(len(self.model), dtype=np.int32)
+        if self.ranges and len(selected):
+            selected = selected[self.matches(selected)]
+        return selected
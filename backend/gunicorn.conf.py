@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+
+# ============================================
+# PRODUCTION SERVER (gunicorn)
+# ============================================
+#   gunicorn -c backend/gunicorn.conf.py backend.app:app
+#
+# Artifacts are loaded once in the master (preload_app) and shared by the
+# forked workers through the memory-mapped .npy files. Each worker serves
+# THREADS requests concurrently; the request path only reads the model
+# and the caches are locked, so threaded workers are safe.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("THREADS", 4))
+worker_class = 'gthread'
+preload_app = os.environ.get("PRELOAD", "1") != "0"
+timeout = int(os.environ.get("TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-' if os.environ.get("ACCESS_LOG") else None
+
+# One BLAS/OpenMP thread per worker thread: the workers already use every
+# core, extra native threads would only oversubscribe them
+for name in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']:
+    os.environ.setdefault(name, '1')
+
+# Workers share their /metrics totals through files in this directory
+# (see metrics.py): a fresh one per server unless METRICS_DIR is set
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="movie-metrics-"))
+
+
+def on_starting(server):
+    """Drop the metrics files left by an earlier run in METRICS_DIR"""
+    for path in Path(os.environ["METRICS_DIR"]).glob("*worker-*.json*"):
+        path.unlink(missing_ok=True)
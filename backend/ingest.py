@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from vocabulary import set_idf
+
+# ============================================
+# STREAMING CSV INGESTION
+# ============================================
+# movies.csv is read in chunks with only the columns the model uses, the
+# combined feature text is built with vectorized string operations, and
+# TF-IDF is fitted from per-chunk sparse term counts, so every text is
+# tokenized once. Peak preprocessing memory is one raw chunk plus the
+# compact output columns and sparse counts.
+
+TEXT_COLUMNS = ['title', 'genres', 'keywords', 'cast', 'director', 'tagline']
+NUMERIC_COLUMNS = ['year', 'popularity']
+FEATURE_COLUMNS = ['genres', 'keywords', 'cast', 'director', 'tagline']
+SEPARATOR_COLUMNS = ['genres', 'keywords', 'cast']
+
+# Raw feature columns that are kept after combining (shown or filtered on)
+KEPT_COLUMNS = ['title', 'genres', 'director'] + NUMERIC_COLUMNS
+
+DEFAULT_CHUNK_SIZE = 20000
+
+# TfidfVectorizer arguments applied after counting rather than while counting
+PRUNING_PARAMS = ['max_df', 'min_df', 'max_features']
+# TfidfVectorizer arguments CountVectorizer does not take; applied when weighting
+WEIGHTING_PARAMS = ['norm', 'use_idf', 'smooth_idf', 'sublinear_tf', 'dtype']
+
+
+def read_movie_chunks(csv_path, chunksize=DEFAULT_CHUNK_SIZE):
+    """Yield DataFrame chunks of movies.csv with only the needed columns"""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [c for c in TEXT_COLUMNS + NUMERIC_COLUMNS if c in header]
+    if 'title' not in usecols:
+        raise ValueError("Missing required column: title")
+    dtype = {c: str for c in usecols if c in TEXT_COLUMNS}
+    return pd.read_csv(csv_path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+
+
+def csv_features(csv_path):
+    """The feature columns present in a movies CSV, in FEATURE_COLUMNS order"""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return [f for f in FEATURE_COLUMNS if f in header]
+
+
+def clean_feature(values, feature):
+    """Vectorized cleanup of one feature column"""
+    values = values.fillna('').astype(str)
+    values = values.where(values.str.lower() != 'nan', '')
+    if feature in SEPARATOR_COLUMNS:
+        values = values.str.replace('|', ' ', regex=False).str.replace(',', ' ', regex=False)
+    return values.str.strip()
+
+
+def combine_features(movies, features):
+    """Join the non-empty cleaned features with single spaces (vectorized)"""
+    combined = pd.Series('', index=movies.index, dtype=object)
+    for feature in features:
+        values = clean_feature(movies[feature], feature)
+        both = (combined != '') & (values != '')
+        combined = (combined + values).where(~both, combined + ' ' + values)
+    return combined
+
+
+def prepare_chunk(chunk, features):
+    """Compact catalog columns plus combined_features for one raw chunk"""
+    prepared = pd.DataFrame(index=chunk.index)
+    for name in KEPT_COLUMNS:
+        if name in chunk.columns:
+            prepared[name] = chunk[name] if name in NUMERIC_COLUMNS else chunk[name].fillna('')
+    for feature in features:
+        if feature not in chunk.columns:
+            chunk[feature] = ''
+    prepared['combined_features'] = combine_features(chunk, features)
+    return prepared
+
+
+def prepare_movies(csv_path, features, chunksize=DEFAULT_CHUNK_SIZE):
+    """Catalog columns plus combined_features of movies.csv, one raw chunk at a time"""
+    frames = [prepare_chunk(chunk, features) for chunk in read_movie_chunks(csv_path, chunksize)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def count_terms(texts, count_params):
+    """Sparse term counts of a chunk and its sorted chunk vocabulary"""
+    counter = CountVectorizer(**count_params)
+    try:
+        counts = counter.fit_transform(texts)
+    except ValueError:
+        # Empty vocabulary (chunk with no usable text)
+        return sparse.csr_matrix((len(texts), 0), dtype=np.int64), np.array([], dtype=object)
+    return counts.tocsr(), counter.get_feature_names_out().astype(object)
+
+
+def term_statistics(counts, terms):
+    """(terms, total counts, document frequencies) of a chunk"""
+    tf = np.asarray(counts.sum(axis=0)).ravel().astype(np.int64)
+    df = np.bincount(counts.indices, minlength=len(terms)).astype(np.int64)
+    return terms, tf, df
+
+
+def merge_statistics(left, right):
+    """Merge two (terms, tf, df) triples, keeping terms sorted"""
+    terms = np.concatenate([left[0], right[0]])
+    unique_terms, inverse = np.unique(terms, return_inverse=True)
+    tf = np.bincount(inverse, weights=np.concatenate([left[1], right[1]]), minlength=len(unique_terms))
+    df = np.bincount(inverse, weights=np.concatenate([left[2], right[2]]), minlength=len(unique_terms))
+    return unique_terms, tf.astype(np.int64), df.astype(np.int64)
+
+
+def vectorizer_from_statistics(stats, n_docs, tfidf_params):
+    """A fitted TfidfVectorizer equivalent to fitting on the whole corpus.
+
+    Applies max_df/min_df/max_features exactly like TfidfVectorizer.fit and
+    sets the smoothed idf from the document frequencies.
+    """
+    vectorizer = TfidfVectorizer(**tfidf_params)
+    terms, tf, df = stats
+
+    max_df, min_df = vectorizer.max_df, vectorizer.min_df
+    high = max_df if isinstance(max_df, (int, np.integer)) else max_df * n_docs
+    low = min_df if isinstance(min_df, (int, np.integer)) else min_df * n_docs
+
+    mask = (df <= high) & (df >= low)
+    limit = vectorizer.max_features
+    if limit is not None and mask.sum() > limit:
+        mask_inds = (-tf[mask]).argsort()[:limit]
+        new_mask = np.zeros(len(df), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+    if not mask.any():
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+
+    kept_terms = terms[mask]
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(kept_terms.tolist())}
+    kept_df = df[mask]
+    if vectorizer.smooth_idf:
+        idf = np.log((1 + n_docs) / (1 + kept_df)) + 1
+    else:
+        idf = np.log(n_docs / kept_df) + 1
+    return set_idf(vectorizer, idf)
+
+
+def tfidf_from_counts(vectorizer, counts, terms):
+    """TF-IDF rows from chunk counts, remapped onto the fitted vocabulary.
+
+    Same result as vectorizer.transform on the chunk text, without
+    tokenizing it again.
+    """
+    vocabulary = vectorizer.vocabulary_
+    column_map = np.array([vocabulary.get(term, -1) for term in terms.tolist()], dtype=np.int64)
+    counts = counts.tocoo()
+    columns = column_map[counts.col]
+    keep = columns >= 0
+    matrix = sparse.csr_matrix(
+        (counts.data[keep].astype(np.float64), (counts.row[keep], columns[keep])),
+        shape=(counts.shape[0], len(vocabulary))
+    )
+    matrix.sort_indices()
+    if vectorizer.sublinear_tf:
+        np.log(matrix.data, matrix.data)
+        matrix.data += 1
+    if vectorizer.use_idf:
+        matrix.data *= vectorizer.idf_[matrix.indices]
+    if vectorizer.norm is not None:
+        matrix = normalize(matrix, norm=vectorizer.norm, copy=False)
+    return matrix.astype(vectorizer.dtype, copy=False)
+
+
+def fit_tfidf(texts, tfidf_params, chunksize=DEFAULT_CHUNK_SIZE):
+    """(fitted vectorizer, TF-IDF matrix) of a text Series, counted in chunks.
+
+    Same result as TfidfVectorizer(**tfidf_params).fit_transform(texts),
+    but every text is tokenized once.
+    """
+    count_params = {
+        k: v for k, v in tfidf_params.items() if k not in PRUNING_PARAMS and k not in WEIGHTING_PARAMS
+    }
+    chunk_counts = []
+    stats = (np.array([], dtype=object), np.zeros(0, np.int64), np.zeros(0, np.int64))
+    for start in range(0, len(texts), chunksize):
+        counts, terms = count_terms(texts.iloc[start:start + chunksize], count_params)
+        stats = merge_statistics(stats, term_statistics(counts, terms))
+        chunk_counts.append((counts, terms))
+    vectorizer = vectorizer_from_statistics(stats, len(texts), tfidf_params)
+    tfidf_matrix = sparse.vstack(
+        [tfidf_from_counts(vectorizer, counts, terms) for counts, terms in chunk_counts],
+        format='csr'
+    )
+    return vectorizer, tfidf_matrix
@@ -0,0 +1,203 @@
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# ============================================
+# LATENCY HISTOGRAMS (PROMETHEUS TEXT FORMAT)
+# ============================================
+# A few fixed-bucket histograms are all /metrics needs, so they are kept
+# here instead of adding a client library. Observing is a bisect and three
+# additions under a lock, cheap enough to leave on for every request.
+#
+# Every gunicorn worker observes into its own histograms. With a shared
+# directory (METRICS_DIR, set by gunicorn.conf.py) each worker writes its
+# totals to <dir>/worker-<pid>.json about once a second, and a scrape
+# sums the files of all workers, so whichever worker answers reports the
+# whole server. Files of workers that exited are kept, so the totals
+# never go down; the directory is emptied when the server starts.
+
+# Seconds between two writes of a worker's totals
+FLUSH_INTERVAL = 1.0
+
+# Seconds, from 50µs (a cached lookup) to 2.5s (a cold fuzzy search)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Timer:
+    """Context manager that observes its duration into a histogram"""
+
+    __slots__ = ('histogram', 'label', 'start')
+
+    def __init__(self, histogram, label):
+        self.histogram = histogram
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(self.label, time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """Thread-safe histogram with one label (e.g. stage or endpoint)"""
+
+    def __init__(self, name, description, label_name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_name = label_name
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, seconds):
+        """Record one duration for a label value"""
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                # Per-bucket counts (+Inf last), sum, count
+                series = self._series[label] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def time(self, label):
+        """`with histogram.time('resolve'): ...`"""
+        return Timer(self, label)
+
+    def state(self):
+        """{label: [per-bucket counts, sum, count]} copy of this process's series"""
+        with self._lock:
+            return {label: [list(counts), total, n] for label, (counts, total, n) in self._series.items()}
+
+    def render(self, series=None):
+        """Prometheus exposition lines for this histogram (or for merged `series`)"""
+        series = self.state() if series is None else series
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        bounds = [repr(b) for b in self.buckets] + ['+Inf']
+        for label, (counts, total, n) in sorted(series.items()):
+            labels = f'{self.label_name}="{label}"'
+            cumulative = []
+            running = 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            for bound, count in zip(bounds, cumulative):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.9f}")
+            lines.append(f"{self.name}_count{{{labels}}} {n}")
+        return lines
+
+
+def merge_series(states):
+    """Sum {label: [per-bucket counts, sum, count]} states of several processes"""
+    merged = {}
+    for state in states:
+        for label, (counts, total, n) in state.items():
+            series = merged.get(label)
+            if series is None:
+                merged[label] = [list(counts), total, n]
+                continue
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += n
+    return merged
+
+
+class SharedMetrics:
+    """Histograms and counters of all worker processes, summed through files in `directory`.
+
+    `counters` returns this process's counter values ({name: value});
+    they are summed like the histograms.
+    """
+
+    def __init__(self, directory, histograms, counters=None, interval=FLUSH_INTERVAL):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.histograms = histograms
+        self.counters = counters or dict
+        self.interval = interval
+        self._start()
+        # A forked worker writes its own file, the parent's thread is not inherited
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The parent's flush thread may have held a lock at the fork
+        for histogram in self.histograms:
+            histogram._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self.path = self.directory / f"worker-{os.getpid()}.json"
+        thread = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+        thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                # Retried on the next tick; metrics must never stop the worker
+                pass
+
+    def flush(self):
+        """Write this process's totals (atomically, a scrape never reads half a file)"""
+        data = {
+            'histograms': {h.name: h.state() for h in self.histograms},
+            'counters': self.counters(),
+        }
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def collect(self):
+        """(merged histogram series by name, summed counters) over all workers"""
+        self.flush()
+        states = []
+        for path in self.directory.glob("worker-*.json"):
+            try:
+                states.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        histograms = {
+            h.name: merge_series(state['histograms'].get(h.name, {}) for state in states)
+            for h in self.histograms
+        }
+        counters = {}
+        for state in states:
+            for name, value in state['counters'].items():
+                counters[name] = counters.get(name, 0) + value
+        return histograms, counters
+
+
+def clear_shared_metrics(directory):
+    """Delete the worker files of an earlier server run"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob("*worker-*.json*"):
+        path.unlink(missing_ok=True)
+
+
+def render_metrics(histograms, values=(), series=None):
+    """Text body for /metrics: histograms plus (name, type, description, value) samples.
+
+    `series` maps histogram names to merged series (see SharedMetrics.collect).
+    """
+    series = series or {}
+    lines = []
+    for histogram in histograms:
+        lines.extend(histogram.render(series.get(histogram.name)))
+    for name, kind, description, value in values:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
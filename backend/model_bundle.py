@@ -0,0 +1,92 @@
+import numpy as np
+
+from facets import build_facets
+from lru_cache import LRUCache
+from rerank import rerank_features
+from suggest import SuggestIndex
+from title_index import first_positions
+
+# ============================================
+# ONE LOADED ARTIFACT VERSION
+# ============================================
+# Everything a request reads (titles, indexes, vectorizer, caches) lives
+# in one ModelBundle that is never changed after it is built. Reloading
+# builds and validates a new bundle and swaps a single reference, so a
+# request that took the reference at its start only ever sees one version.
+
+
+class ModelBundle:
+    """Serving state of one artifact version, built from load_artifacts()"""
+
+    def __init__(self, artifacts, query_cache_size=0, result_cache_size=0, cache_ttl=None,
+                 ann_probes=None):
+        self.manifest = artifacts['manifest']
+        self.version = self.manifest['version']
+        self.catalog = artifacts['catalog']
+        self.title_index = artifacts['title_index']
+        self.vectorizer = artifacts['vectorizer']
+        self.tfidf_matrix = artifacts['tfidf_matrix']
+        self.ann_index = artifacts['ann_index']
+        if self.ann_index is not None and ann_probes:
+            self.ann_index.n_probe = ann_probes
+        self.neighbor_indices = artifacts['neighbor_indices']
+        self.neighbor_scores = artifacts['neighbor_scores']
+        self.available_features = artifacts['available_features']
+
+        # Titles are decoded once here (before gunicorn forks the workers)
+        self.all_titles = self.title_index.titles
+        self.title_to_index = first_positions(self.all_titles)
+        self.title_groups = self.catalog['title_group']
+        self.result_counts = self.catalog['result_count']
+        self.display_directors = (
+            self.catalog['director_display'] if 'director_display' in self.catalog else None
+        )
+        self.display_genres = (
+            self.catalog['genres_display'] if 'genres_display' in self.catalog else None
+        )
+        self.facets = build_facets(self.catalog)
+        self.popularity_score, self.recency_score = rerank_features(self.catalog)
+        self.suggest_index = SuggestIndex(
+            self.all_titles,
+            self.catalog['popularity'] if 'popularity' in self.catalog else None
+        )
+
+        # raw query -> resolved title, and resolved title -> response payload.
+        # They belong to this version, so a swap drops them with it.
+        self.query_cache = LRUCache(query_cache_size, cache_ttl)
+        self.result_cache = LRUCache(result_cache_size, cache_ttl)
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def validate(self):
+        """Raise ValueError when the arrays do not belong together.
+
+        Reading the arrays also pages them in, so the first requests after
+        a swap do not pay for it.
+        """
+        n_movies = len(self.catalog)
+        problems = []
+        if n_movies == 0:
+            problems.append("empty catalog")
+        if len(self.all_titles) != n_movies:
+            problems.append(f"{len(self.all_titles)} titles for {n_movies} movies")
+        if self.neighbor_indices.shape[0] != n_movies:
+            problems.append(f"neighbor index has {self.neighbor_indices.shape[0]} rows")
+        if self.neighbor_scores.shape != self.neighbor_indices.shape:
+            problems.append("neighbor scores and indices differ in shape")
+        elif n_movies and int(np.max(self.neighbor_indices)) >= n_movies:
+            problems.append("neighbor index points past the catalog")
+        if self.tfidf_matrix.shape[0] != n_movies:
+            problems.append(f"TF-IDF matrix has {self.tfidf_matrix.shape[0]} rows")
+        if self.tfidf_matrix.shape[1] != len(self.vectorizer.vocabulary_):
+            problems.append("TF-IDF matrix does not match the vectorizer vocabulary")
+        if len(self.title_groups) != n_movies or len(self.result_counts) != n_movies:
+            problems.append("catalog columns have different lengths")
+        if self.ann_index is not None and self.ann_index.embedding.shape[0] != n_movies:
+            problems.append(f"ANN embedding has {self.ann_index.embedding.shape[0]} rows")
+        if not problems and self.title_index.resolve(self.all_titles[0]) is None:
+            problems.append("title index cannot resolve the first title")
+        if problems:
+            raise ValueError(f"Artifact version {self.version} is invalid: " + "; ".join(problems))
+        return self
@@ -0,0 +1,182 @@
+import numpy as np
+from joblib import Parallel, delayed
+
+# ============================================
+# SPARSE TOP-K NEIGHBOR INDEX
+# ============================================
+# Instead of a dense N x N similarity matrix we only keep the K most
+# similar movies for every movie. Two compact arrays are stored:
+#   neighbor_indices  int32   (N, K)  - movie index, -1 for empty slots
+#   neighbor_scores   float32 (N, K)  - cosine similarity, sorted descending
+
+DEFAULT_TOP_K = 50
+DEFAULT_BLOCK_SIZE = 512
+
+
+def topk_from_scores(scores, top_k, exclude=None):
+    """Select the top-K columns of every row of a dense score block.
+
+    `exclude` is an optional array with one column index per row that is
+    removed from the candidates (the movie itself).
+    """
+    n_rows, n_cols = scores.shape
+    k = min(top_k, n_cols)
+
+    if exclude is not None:
+        scores[np.arange(n_rows), exclude] = -np.inf
+
+    if k < n_cols:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(n_cols), (n_rows, 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    indices = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+    values = np.take_along_axis(candidate_scores, order, axis=1).astype(np.float32)
+
+    # Only positive similarities are useful recommendations
+    empty = ~(values > 0)
+    indices[empty] = -1
+    values[empty] = 0.0
+
+    if k < top_k:
+        pad = top_k - k
+        indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+        values = np.pad(values, ((0, 0), (0, pad)), constant_values=0.0)
+
+    return indices, values
+
+
+def block_size_for_budget(n_movies, memory_mb, n_jobs=1):
+    """Largest block size whose score blocks fit in a memory budget.
+
+    A block of B rows needs about 3 x B x N float32 values (scores plus the
+    argpartition and gather temporaries) in every worker.
+    """
+    bytes_per_row = 3 * 4 * max(n_movies, 1)
+    rows = int(memory_mb * 1024 * 1024 / (bytes_per_row * max(n_jobs, 1)))
+    return max(1, rows)
+
+
+def _block_topk(tfidf_matrix, matrix_t, start, end, top_k):
+    """Top-K neighbors of rows start:end (runs in a worker process)"""
+    block = (tfidf_matrix[start:end] @ matrix_t).toarray()
+    indices, values = topk_from_scores(block, top_k, exclude=np.arange(start, end))
+    return start, end, indices, values
+
+
+def build_neighbor_index(tfidf_matrix, top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE,
+                         n_jobs=1, output_dir=None):
+    """Build the top-K neighbor arrays from an L2-normalized TF-IDF matrix.
+
+    Rows are processed in blocks, so peak memory is block_size x N per
+    worker instead of N x N. TF-IDF rows are L2-normalized, so the dot
+    product is the cosine similarity. With n_jobs > 1 (or -1 for all
+    cores) blocks run in a joblib process pool; with `output_dir` the
+    results are streamed into neighbor_indices.npy / neighbor_scores.npy
+    there and memory-mapped arrays are returned.
+    """
+    tfidf_matrix = tfidf_matrix.tocsr().astype(np.float32)
+    n_movies = tfidf_matrix.shape[0]
+    matrix_t = tfidf_matrix.T.tocsr()
+
+    if output_dir is not None:
+        neighbor_indices = np.lib.format.open_memmap(
+            output_dir / "neighbor_indices.npy", mode='w+', dtype=np.int32, shape=(n_movies, top_k)
+        )
+        neighbor_scores = np.lib.format.open_memmap(
+            output_dir / "neighbor_scores.npy", mode='w+', dtype=np.float32, shape=(n_movies, top_k)
+        )
+    else:
+        neighbor_indices = np.empty((n_movies, top_k), dtype=np.int32)
+        neighbor_scores = np.empty((n_movies, top_k), dtype=np.float32)
+
+    blocks = [(start, min(start + block_size, n_movies)) for start in range(0, n_movies, block_size)]
+    if n_jobs == 1 or len(blocks) <= 1:
+        results = (_block_topk(tfidf_matrix, matrix_t, start, end, top_k) for start, end in blocks)
+    else:
+        # Results come back in order and at most 2 x n_jobs blocks are in
+        # flight, so memory stays bounded whatever the catalog size
+        results = Parallel(n_jobs=n_jobs, return_as='generator', pre_dispatch='2*n_jobs')(
+            delayed(_block_topk)(tfidf_matrix, matrix_t, start, end, top_k) for start, end in blocks
+        )
+
+    for start, end, indices, values in results:
+        neighbor_indices[start:end] = indices
+        neighbor_scores[start:end] = values
+
+    if output_dir is not None:
+        neighbor_indices.flush()
+        neighbor_scores.flush()
+
+    return neighbor_indices, neighbor_scores
+
+
+def update_neighbor_index(tfidf_matrix, neighbor_indices, neighbor_scores, changed,
+                          block_size=DEFAULT_BLOCK_SIZE):
+    """Patch a neighbor index after the rows in `changed` were added or modified.
+
+    `tfidf_matrix` is the full, updated matrix (N rows); the neighbor arrays
+    cover the first N_old <= N rows. Changed rows, and rows whose neighbor
+    list contained a modified movie (their stored score is stale), are
+    recomputed. Every other row only merges the changed movies into its
+    existing top-K, so the cost is O(N x len(changed)) instead of O(N^2).
+    """
+    tfidf_matrix = tfidf_matrix.tocsr()
+    n_movies = tfidf_matrix.shape[0]
+    n_old, top_k = neighbor_indices.shape
+    changed = np.unique(np.asarray(changed, dtype=np.int64))
+
+    indices = np.full((n_movies, top_k), -1, dtype=np.int32)
+    scores = np.zeros((n_movies, top_k), dtype=np.float32)
+    indices[:n_old] = neighbor_indices
+    scores[:n_old] = neighbor_scores
+
+    is_changed = np.zeros(n_movies, dtype=bool)
+    is_changed[changed] = True
+    stale = (indices >= 0) & is_changed[np.maximum(indices, 0)]
+    recompute = np.union1d(changed, np.nonzero(stale.any(axis=1))[0])
+    merge = np.ones(n_movies, dtype=bool)
+    merge[recompute] = False
+
+    # Merge the changed movies into the top-K of every untouched row
+    changed_t = tfidf_matrix[changed].T.tocsc()
+    changed_columns = changed.astype(np.int32)
+    for start in range(0, n_movies, block_size):
+        end = min(start + block_size, n_movies)
+        rows = np.arange(start, end)[merge[start:end]]
+        if len(rows) == 0:
+            continue
+        new_scores = (tfidf_matrix[rows] @ changed_t).toarray().astype(np.float32)
+        candidate_indices = np.concatenate(
+            [indices[rows], np.broadcast_to(changed_columns, new_scores.shape)], axis=1
+        )
+        candidate_scores = np.concatenate([scores[rows], new_scores], axis=1)
+        candidate_scores[candidate_indices < 0] = -np.inf
+        positions, values = topk_from_scores(candidate_scores, top_k)
+        picked = np.take_along_axis(candidate_indices, np.maximum(positions, 0), axis=1)
+        indices[rows] = np.where(positions >= 0, picked, -1)
+        scores[rows] = values
+
+    # Changed rows and rows with stale scores get a full recomputation
+    matrix_t = tfidf_matrix.T.tocsc()
+    for start in range(0, len(recompute), block_size):
+        rows = recompute[start:start + block_size]
+        block = (tfidf_matrix[rows] @ matrix_t).toarray().astype(np.float32, copy=False)
+        indices[rows], scores[rows] = topk_from_scores(block, top_k, exclude=rows)
+
+    return indices, scores
+
+
+def save_neighbor_index(models_dir, neighbor_indices, neighbor_scores):
+    """Save the neighbor arrays as plain .npy files"""
+    np.save(models_dir / "neighbor_indices.npy", neighbor_indices)
+    np.save(models_dir / "neighbor_scores.npy", neighbor_scores)
+
+
+def load_neighbor_index(models_dir, mmap_mode=None):
+    """Load the neighbor arrays saved by save_neighbor_index"""
+    neighbor_indices = np.load(models_dir / "neighbor_indices.npy", mmap_mode=mmap_mode)
+    neighbor_scores = np.load(models_dir / "neighbor_scores.npy", mmap_mode=mmap_mode)
+    return neighbor_indices, neighbor_scores
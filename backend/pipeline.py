@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from artifacts import ARTIFACT_FORMAT
+from catalog import StringColumn, encode_strings
+
+# ============================================
+# CONTENT-ADDRESSED STAGE CACHE
+# ============================================
+# Every stage of the offline build writes its output to
+#   <cache dir>/<stage>/<key>/
+# where key is a hash of everything the output depends on: the keys of
+# the stages it reads, its parameters and the content hash of the input
+# file. A stage whose key already has a complete directory is loaded
+# instead of rerun, so changing a vectorizer parameter skips the CSV
+# parse and the feature combination, and an unchanged build only loads.
+# The directory is written under a temporary name and renamed once its
+# stage.json is written, so an interrupted stage is never reused.
+#
+# Parameters that do not change the output (worker count, block and
+# chunk sizes) are not part of the keys. Every key includes
+# PIPELINE_FORMAT and the artifact ARTIFACT_FORMAT, so a change of either
+# never reuses stage outputs or a published version from before it.
+
+# Bump when the output of any stage changes for the same inputs
+PIPELINE_FORMAT = 1
+STAGE_FILE = "stage.json"
+# Outputs kept per stage (least recently used are deleted after a build)
+DEFAULT_KEEP = 3
+
+
+def stage_key(stage, inputs):
+    """Hash of a stage name and its JSON-serializable inputs"""
+    payload = json.dumps(
+        {'format': PIPELINE_FORMAT, 'artifact_format': ARTIFACT_FORMAT, 'stage': stage, 'inputs': inputs},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+
+class StageCache:
+    """Runs pipeline stages, reusing outputs whose inputs did not change"""
+
+    def __init__(self, cache_dir, force=False, keep=DEFAULT_KEEP):
+        self.cache_dir = Path(cache_dir)
+        self.force = force
+        self.keep = keep
+        self.timings = []
+
+    def run(self, stage, inputs, build, load):
+        """(output, key) of a stage.
+
+        `build(directory)` computes the output, writes it into the
+        directory and returns a JSON-serializable info dict;
+        `load(directory, info)` reads it back. The output is always
+        returned through `load`, so a fresh and a cached run give the
+        same objects.
+        """
+        key = stage_key(stage, inputs)
+        stage_dir = self.cache_dir / stage / key
+        start = time.perf_counter()
+        if not self.force and (stage_dir / STAGE_FILE).exists():
+            status = 'cached'
+            # The mtime of stage.json orders the outputs for prune()
+            os.utime(stage_dir / STAGE_FILE)
+        else:
+            status = 'ran'
+            tmp_dir = self.cache_dir / stage / f".tmp-{key}-{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir(parents=True)
+            info = build(tmp_dir)
+            with open(tmp_dir / STAGE_FILE, 'w') as f:
+                json.dump({'stage': stage, 'key': key, 'inputs': inputs, 'info': info}, f, indent=2, default=str)
+            shutil.rmtree(stage_dir, ignore_errors=True)
+            os.rename(tmp_dir, stage_dir)
+        with open(stage_dir / STAGE_FILE) as f:
+            info = json.load(f)['info']
+        output = load(stage_dir, info)
+        self.record(stage, status, time.perf_counter() - start)
+        return output, key
+
+    def record(self, stage, status, seconds):
+        """Add a line to the timing summary"""
+        self.timings.append((stage, status, seconds))
+        print(f"   ⏱️ {stage}: {status} in {seconds:.2f}s")
+
+    def summary(self):
+        """Timing table of the stages run so far"""
+        lines = ["⏱️ Stage timings:"]
+        for stage, status, seconds in self.timings:
+            lines.append(f"   {stage:<10} {status:<10} {seconds:8.2f}s")
+        lines.append(f"   {'total':<10} {'':<10} {sum(t[2] for t in self.timings):8.2f}s")
+        return "\n".join(lines)
+
+    def prune(self):
+        """Delete all but the `keep` most recently used outputs of every stage"""
+        if not self.cache_dir.exists():
+            return
+        for stage_root in self.cache_dir.iterdir():
+            if not stage_root.is_dir():
+                continue
+            outputs = [d for d in stage_root.iterdir() if (d / STAGE_FILE).exists()]
+            outputs.sort(key=lambda d: (d / STAGE_FILE).stat().st_mtime, reverse=True)
+            for stale in outputs[self.keep:]:
+                shutil.rmtree(stale, ignore_errors=True)
+
+
+def save_frame(directory, frame):
+    """Write a DataFrame of text and numeric columns as .npy files; returns the column kinds.
+
+    Text columns are stored with missing values as '' and numeric ones as
+    float64 with NaN, the same way the catalog stores them.
+    """
+    kinds = {}
+    for name in frame.columns:
+        values = frame[name]
+        if pd.api.types.is_numeric_dtype(values):
+            np.save(directory / f"{name}.npy", values.to_numpy(dtype=np.float64))
+            kinds[name] = 'numeric'
+        else:
+            data, offsets = encode_strings(values.fillna('').astype(str))
+            np.save(directory / f"{name}.data.npy", data)
+            np.save(directory / f"{name}.offsets.npy", offsets)
+            kinds[name] = 'text'
+    return {'columns': kinds, 'rows': int(len(frame))}
+
+
+def load_frame(directory, info):
+    """Read a DataFrame written by save_frame"""
+    data = {}
+    for name, kind in info['columns'].items():
+        if kind == 'numeric':
+            data[name] = np.load(directory / f"{name}.npy")
+        else:
+            column = StringColumn(np.load(directory / f"{name}.data.npy"), np.load(directory / f"{name}.offsets.npy"))
+            data[name] = pd.Series(column.tolist(), dtype=object)
+    return pd.DataFrame(data, index=pd.RangeIndex(info['rows']))
@@ -0,0 +1,61 @@
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# ============================================
+# SAMPLING PROFILER
+# ============================================
+# Samples the Python stacks of every other thread of this process at a
+# fixed interval and counts identical stacks. Nothing is traced between
+# samples, so it can run against a live worker under real traffic. The
+# output is the "collapsed stack" format that flamegraph.pl and
+# speedscope read: one `frame;frame;frame count` line per stack.
+
+DEFAULT_INTERVAL = 0.005
+MAX_DURATION = 60
+
+# Leaf functions of threads that are waiting for work, not doing it
+IDLE_FUNCTIONS = {'wait', 'select', 'poll', 'accept', 'watch_models'}
+
+
+def frame_name(frame):
+    """module:function"""
+    code = frame.f_code
+    return f"{Path(code.co_filename).stem}:{code.co_name}"
+
+
+def collapse_stack(frame):
+    """Root-first `a;b;c` string for a frame and its callers"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def sample_stacks(duration, interval=DEFAULT_INTERVAL, ignore_idle=True):
+    """Counter of collapsed stacks seen over `duration` seconds.
+
+    `ignore_idle` drops threads that are waiting for work (the accept
+    loop, lock waits, the model watcher), so the counts show where
+    requests spend their time.
+    """
+    own_thread = threading.get_ident()
+    stacks = Counter()
+    deadline = time.perf_counter() + min(duration, MAX_DURATION)
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            if ignore_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            stacks[collapse_stack(frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def format_collapsed(stacks):
+    """Collapsed-stack text, most frequent stack first"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from artifacts import read_manifest
+from catalog import load_catalog
+from facets import build_facets
+from lru_cache import LRUCache
+from suggest import SuggestIndex
+from title_index import first_positions, load_title_index
+
+# ============================================
+# PRECOMPUTED RECOMMENDATION STORE
+# ============================================
+# Title lookups have a finite answer set: one payload per distinct title.
+# build_store.py computes all of them offline and writes
+#   models/<version>/recommendations.sqlite
+#     recommendations(position, title, normalized, payload)
+#       position    catalog index of the first movie with this title
+#       title       unique index, the key after title resolution
+#       normalized  indexed lowercase title, answers exact searches
+#                   without running the resolver
+#       payload     the /recommend JSON body
+#     meta(key, value)   version, checksum, build settings
+# With SERVING_MODE=store a worker only loads the titles and the title
+# index (plus the typeahead index) and answers /recommend with one keyed
+# read; the TF-IDF matrix and the neighbor index are never opened.
+
+STORE_FILE = "recommendations.sqlite"
+
+
+def normalize_title(text):
+    """Key of the exact-match tier of the title resolver"""
+    return text.lower().strip()
+
+
+def store_path(version_dir):
+    """Where the store of an artifact version lives"""
+    return Path(version_dir) / STORE_FILE
+
+
+def write_store(path, rows, meta):
+    """Write (position, title, payload JSON) rows to a new SQLite file.
+
+    The file is written next to its final path and renamed into place,
+    so serving never opens a half-written store.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".tmp-{os.getpid()}-{path.name}")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    connection = sqlite3.connect(str(tmp_path))
+    try:
+        # Nothing to recover if the build dies, the temporary file is dropped
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(
+            "CREATE TABLE recommendations ("
+            "position INTEGER PRIMARY KEY, title TEXT NOT NULL, "
+            "normalized TEXT NOT NULL, payload TEXT NOT NULL)"
+        )
+        connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        count = 0
+        for position, title, payload in rows:
+            connection.execute(
+                "INSERT INTO recommendations VALUES (?, ?, ?, ?)",
+                (position, title, normalize_title(title), payload)
+            )
+            count += 1
+        # Indexes are cheaper to build once after the inserts
+        connection.execute("CREATE UNIQUE INDEX title_key ON recommendations (title)")
+        connection.execute("CREATE INDEX normalized_key ON recommendations (normalized, position)")
+        meta = dict(meta, rows=count, built_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        connection.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in meta.items()]
+        )
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+class RecommendationStore:
+    """Read-only access to a store written by write_store.
+
+    SQLite connections must not be shared between threads, so every
+    thread opens its own (cheap, the pages live in the OS cache).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path).resolve()
+        if not self.path.exists():
+            raise FileNotFoundError(f"No recommendation store at {self.path}, run build_store.py")
+        self._local = threading.local()
+        rows = self._connection().execute("SELECT key, value FROM meta").fetchall()
+        self.meta = {key: json.loads(value) for key, value in rows}
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            self._local.connection = connection
+        return connection
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def get(self, title):
+        """Payload JSON of a resolved title, or None"""
+        row = self._connection().execute(
+            "SELECT payload FROM recommendations WHERE title = ?", (title,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_exact(self, search_term):
+        """Payload JSON of the first title equal to the search term ignoring case, or None"""
+        row = self._connection().execute(
+            "SELECT payload FROM recommendations WHERE normalized = ? ORDER BY position LIMIT 1",
+            (normalize_title(search_term),)
+        ).fetchone()
+        return row[0] if row else None
+
+
+class StoreBundle:
+    """Serving state of one artifact version answered from its recommendation store.
+
+    Has the attributes the routes read from a ModelBundle for title
+    lookups, typeahead and the catalog listing; nothing that needs the
+    TF-IDF matrix or the neighbor index.
+    """
+
+    def __init__(self, models_dir, version=None, mmap_mode='r', verify=True, checksum=None,
+                 query_cache_size=0, cache_ttl=None):
+        version_dir, self.manifest = read_manifest(models_dir, version, verify=verify, checksum=checksum)
+        self.version = self.manifest['version']
+        self.available_features = self.manifest['features_used']
+        self.store = RecommendationStore(store_path(version_dir))
+
+        self.catalog = load_catalog(version_dir, self.manifest['catalog_columns'], mmap_mode=mmap_mode)
+        self.title_index = load_title_index(version_dir, self.catalog['title'].tolist(), mmap_mode=mmap_mode)
+        self.all_titles = self.title_index.titles
+        self.title_to_index = first_positions(self.all_titles)
+        self.ann_index = None
+        self.facets = build_facets(self.catalog)
+        self.suggest_index = SuggestIndex(
+            self.all_titles,
+            self.catalog['popularity'] if 'popularity' in self.catalog else None
+        )
+
+        # Resolved titles are cached like in ModelBundle; the payloads
+        # already are a keyed read
+        self.query_cache = LRUCache(query_cache_size, cache_ttl)
+        self.result_cache = LRUCache(0)
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def validate(self):
+        """Raise ValueError when the store does not belong to this version"""
+        problems = []
+        if self.store.meta.get('checksum') != self.manifest['checksum']:
+            problems.append(f"recommendation store was built for version {self.store.meta.get('version')}")
+        elif len(self.store) != len(self.title_to_index):
+            problems.append(f"recommendation store has {len(self.store)} titles, expected {len(self.title_to_index)}")
+        elif self.store.get(self.all_titles[0]) is None:
+            problems.append("recommendation store has no entry for the first title")
+        if problems:
+            raise ValueError(f"Artifact version {self.version} is invalid: " + "; ".join(problems))
+        return self
@@ -0,0 +1,110 @@
+import numpy as np
+
+# ============================================
+# HYBRID RE-RANKING WITH MMR DIVERSITY
+# ============================================
+# A candidate pool of a few hundred similar movies is re-ordered by
+#   relevance = similarity + popularity_weight * popularity + recency_weight * recency
+# and Maximal Marginal Relevance picks the results one at a time:
+#   mmr = (1 - diversity) * relevance - diversity * max similarity to the picks so far
+# so a sequel that is nearly identical to an already chosen movie loses
+# to a slightly less similar but different one. Popularity and recency
+# are precomputed per movie at load time as values in [0, 1]. Only the
+# similarities of the picked movies to the pool are computed (one sparse
+# matrix-vector product per pick), never the full pool x pool matrix.
+
+DEFAULT_POOL = 200
+DEFAULT_POPULARITY_WEIGHT = 0.1
+DEFAULT_RECENCY_WEIGHT = 0.05
+DEFAULT_DIVERSITY = 0.3
+
+
+def percentile_scores(values):
+    """Rank of every value scaled to [0, 1] (missing values score 0)"""
+    values = np.asarray(values, dtype=np.float64)
+    scores = np.zeros(len(values), dtype=np.float32)
+    present = ~np.isnan(values)
+    n_present = int(present.sum())
+    if n_present > 1:
+        ranks = np.argsort(np.argsort(values[present], kind='stable'), kind='stable')
+        scores[present] = ranks / (n_present - 1)
+    return scores
+
+
+def recency_scores(years):
+    """Release year scaled to [0, 1] between the oldest and newest movie"""
+    years = np.asarray(years, dtype=np.float64)
+    scores = np.zeros(len(years), dtype=np.float32)
+    present = ~np.isnan(years)
+    if present.any():
+        low, high = years[present].min(), years[present].max()
+        if high > low:
+            scores[present] = (years[present] - low) / (high - low)
+    return scores
+
+
+def rerank_features(catalog):
+    """(popularity, recency) scores of every movie, zeros for missing columns"""
+    n_movies = len(catalog)
+    popularity = (
+        percentile_scores(catalog['popularity']) if 'popularity' in catalog
+        else np.zeros(n_movies, dtype=np.float32)
+    )
+    recency = (
+        recency_scores(catalog['year']) if 'year' in catalog
+        else np.zeros(n_movies, dtype=np.float32)
+    )
+    return popularity, recency
+
+
+def dense_row(vectors, position):
+    """One row of a CSR matrix as a dense vector"""
+    start, end = vectors.indptr[position], vectors.indptr[position + 1]
+    row = np.zeros(vectors.shape[1], dtype=np.float32)
+    row[vectors.indices[start:end]] = vectors.data[start:end]
+    return row
+
+
+def mmr_order(relevance, vectors, count, diversity):
+    """Positions of the `count` candidates picked by Maximal Marginal Relevance.
+
+    `vectors` are the L2-normalized TF-IDF rows of the candidates (CSR).
+    Every step scores the whole pool at once; only the `count` picks are
+    sequential.
+    """
+    n = len(relevance)
+    count = min(count, n)
+    picked = np.empty(count, dtype=np.int64)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for step in range(count):
+        mmr = (1 - diversity) * relevance - diversity * max_similarity
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        picked[step] = best
+        available[best] = False
+        if step + 1 < count:
+            np.maximum(max_similarity, vectors @ dense_row(vectors, best), out=max_similarity)
+    return picked
+
+
+def rerank(candidates, similarities, vectors, popularity, recency, count,
+           popularity_weight=DEFAULT_POPULARITY_WEIGHT, recency_weight=DEFAULT_RECENCY_WEIGHT,
+           diversity=DEFAULT_DIVERSITY):
+    """Re-ordered (candidates, similarities), `count` long.
+
+    `vectors` are the L2-normalized TF-IDF rows of the candidates, so
+    their pairwise cosine similarity is a dot product.
+    """
+    if len(candidates) == 0:
+        return candidates, similarities
+    relevance = (
+        similarities.astype(np.float32)
+        + popularity_weight * popularity[candidates]
+        + recency_weight * recency[candidates]
+    )
+    if diversity > 0:
+        picked = mmr_order(relevance, vectors, count, diversity)
+    else:
+        picked = np.argsort(-relevance, kind='stable')[:count]
+    return candidates[picked], similarities[picked]
@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# ============================================
+# VIEWING SESSIONS ("BECAUSE YOU WATCHED")
+# ============================================
+# A session is the list of the last titles a user watched, most recent
+# last. Sessions live in one SQLite file shared by every worker process,
+# so a user's history is complete whichever worker answers:
+#   sessions(id, history, updated)
+#     history  JSON list of titles
+#     updated  time of the last update; a session expires `ttl` seconds
+#              after it, and past `max_sessions` the least recently
+#              updated ones are deleted
+# Titles (not row numbers) are stored, so a session survives a model
+# reload.
+#
+# Recommendations aggregate the stored top-K neighbor rows of the
+# watched movies, each weighted by decay ** (how many titles ago it was
+# watched):
+#   score(m) = sum_i decay^age_i * similarity(watched_i, m) / sum_i decay^age_i
+# The H x K rows are summed with one np.unique + np.bincount, so a
+# request costs O(H * K) whatever the catalog size.
+
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_TTL = 1800
+DEFAULT_HISTORY = 20
+DEFAULT_DECAY = 0.8
+# Expired and surplus sessions are deleted every PRUNE_EVERY updates
+PRUNE_EVERY = 100
+# How long a worker waits for another one's write (seconds)
+BUSY_TIMEOUT = 5.0
+
+
+class SessionStore:
+    """Watch histories in a SQLite file shared by all workers, bounded by count and TTL.
+
+    SQLite connections must not be shared between threads or carried
+    across fork, so every thread of every process opens its own.
+    """
+
+    def __init__(self, path, max_sessions=DEFAULT_MAX_SESSIONS, ttl=DEFAULT_TTL, max_history=DEFAULT_HISTORY):
+        self.path = Path(path)
+        self.max_sessions = max_sessions
+        self.ttl = ttl or None
+        self.max_history = max_history
+        self._local = threading.local()
+        self._updates = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, history TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT, isolation_level=None)
+            # Readers never wait for the writer
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _oldest_live(self):
+        """Sessions updated before this time are expired"""
+        return time.time() - self.ttl if self.ttl else float('-inf')
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE updated >= ?", (self._oldest_live(),)
+        ).fetchone()[0]
+
+    def history(self, session_id):
+        """Watched titles, most recent last (empty for an unknown or expired session)"""
+        row = self._connection().execute(
+            "SELECT history FROM sessions WHERE id = ? AND updated >= ?", (session_id, self._oldest_live())
+        ).fetchone()
+        return tuple(json.loads(row[0])) if row else ()
+
+    def record(self, session_id, titles):
+        """Append watched titles and return the new history.
+
+        A title watched again moves to the end; only the last
+        `max_history` titles are kept.
+        """
+        # Last occurrence of every new title, in watch order
+        titles = list(dict.fromkeys(reversed(titles)))[::-1]
+        connection = self._connection()
+        # Takes the write lock first, so concurrent updates of one
+        # session (from any worker) are applied one after the other
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            current = self.history(session_id)
+            history = [t for t in current if t not in titles] + titles
+            history = tuple(history[-self.max_history:])
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (session_id, json.dumps(history), time.time())
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._updates += 1
+        if self._updates % PRUNE_EVERY == 0:
+            self.prune()
+        return history
+
+    def clear(self, session_id):
+        """Forget a session; returns whether it existed"""
+        cursor = self._connection().execute(
+            "DELETE FROM sessions WHERE id = ? AND updated >= ?", (session_id, self._oldest_live())
+        )
+        return cursor.rowcount > 0
+
+    def prune(self):
+        """Delete expired sessions and the least recently updated ones past max_sessions"""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM sessions WHERE updated < ?", (self._oldest_live(),))
+            connection.execute(
+                "DELETE FROM sessions WHERE id IN "
+                "(SELECT id FROM sessions ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+
+    def stats(self):
+        """Counters for /debug"""
+        return {
+            'size': len(self),
+            'maxsize': self.max_sessions,
+            'ttl': self.ttl,
+            'max_history': self.max_history,
+            'path': str(self.path),
+        }
+
+
+def session_scores(neighbor_indices, neighbor_scores, watched, decay=DEFAULT_DECAY):
+    """(candidate indices, decayed mean similarity) over the watched movies' neighbor rows.
+
+    `watched` are movie indices, most recent last. Candidates are unsorted
+    and may include watched movies.
+    """
+    watched = np.asarray(watched, dtype=np.int64)
+    weights = (decay ** np.arange(len(watched) - 1, -1, -1)).astype(np.float32)
+    rows = np.asarray(neighbor_indices[watched])
+    scores = np.asarray(neighbor_scores[watched]) * weights[:, None]
+    valid = (rows >= 0) & (scores > 0)
+    candidates, inverse = np.unique(rows[valid], return_inverse=True)
+    totals = np.bincount(inverse, weights=scores[valid], minlength=len(candidates))
+    return candidates, (totals / weights.sum()).astype(np.float32)
@@ -0,0 +1,149 @@
+import bisect
+import re
+
+import numpy as np
+
+# ============================================
+# TYPEAHEAD PREFIX INDEX
+# ============================================
+# Built at load time from the titles. Every distinct word of every title
+# is one entry; the entries are sorted, so all words starting with a
+# prefix are one contiguous range found with two bisects:
+#   keys   list of words, sorted
+#   ranks  int32 popularity rank of the entry's title (0 = most popular)
+# A range is turned into the best titles with np.partition on the ranks,
+# which is linear in the range size and never sorts it. Results of the
+# one- and two-character prefixes (the widest ranges) are memoized.
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Multi-word queries verify candidates in rank order, in growing batches
+# up to this many
+VERIFY_BATCH = 64
+MAX_VERIFY = 5000
+MEMO_PREFIX_LENGTH = 2
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def title_words(text):
+    """Lowercase words of a title or query"""
+    return WORD_PATTERN.findall(text.lower())
+
+
+def popularity_ranks(n_titles, popularity=None):
+    """(rank of every title, title index of every rank), most popular first"""
+    if popularity is None:
+        order = np.arange(n_titles)
+    else:
+        scores = np.nan_to_num(np.asarray(popularity, dtype=np.float64), nan=-np.inf)
+        order = np.argsort(-scores, kind='stable')
+    ranks = np.empty(n_titles, dtype=np.int32)
+    ranks[order] = np.arange(n_titles, dtype=np.int32)
+    return ranks, order.astype(np.int32)
+
+
+class SuggestIndex:
+    """Title suggestions by word prefix, ranked by popularity"""
+
+    def __init__(self, titles, popularity=None):
+        self.titles = titles
+        title_ranks, self.by_rank = popularity_ranks(len(titles), popularity)
+
+        words = []
+        word_ranks = []
+        for title, rank in zip(titles, title_ranks.tolist()):
+            distinct = set(title_words(title))
+            words.extend(distinct)
+            word_ranks.extend([rank] * len(distinct))
+        # Sorting positions by word is much cheaper than sorting tuples
+        order = sorted(range(len(words)), key=words.__getitem__)
+        self.keys = [words[i] for i in order]
+        self.ranks = np.array(word_ranks, dtype=np.int32)[np.array(order, dtype=np.int64)]
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def word_range(self, prefix):
+        """[lo, hi) of the entries whose word starts with prefix"""
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + '\U0010ffff', lo)
+        return lo, hi
+
+    def best_ranks(self, lo, hi, count):
+        """Up to `count` distinct ranks of a range, best first"""
+        ranks = self.ranks[lo:hi]
+        if len(ranks) > 4 * count:
+            # A title appears once per matching word, so keep some slack
+            best = np.unique(np.partition(ranks, 4 * count)[:4 * count + 1])
+            if len(best) >= count:
+                return best[:count]
+        return np.unique(ranks)[:count]
+
+    def prefix_ranks(self, prefix, count):
+        """Best title ranks for a single word prefix (memoized when short)"""
+        if len(prefix) <= MEMO_PREFIX_LENGTH:
+            memo = self._memo.get(prefix)
+            if memo is None:
+                memo = self.best_ranks(*self.word_range(prefix), 2 * MAX_LIMIT)
+                if len(memo):
+                    # Only prefixes of existing words, so the memo stays bounded
+                    self._memo[prefix] = memo
+            return memo[:count]
+        return self.best_ranks(*self.word_range(prefix), count)
+
+    def matches_all(self, title_index, prefixes):
+        """Every query word is the prefix of some word of the title"""
+        words = title_words(self.titles[title_index])
+        return all(any(word.startswith(prefix) for word in words) for prefix in prefixes)
+
+    def verified_candidates(self, prefixes):
+        """Title indices matching every prefix, best rank first.
+
+        The narrowest word range is read in batches of growing size, so a
+        common first word does not cost a scan of its whole range.
+        """
+        lo, hi = min((self.word_range(p) for p in prefixes), key=lambda r: r[1] - r[0])
+        checked = 0
+        count = VERIFY_BATCH
+        while checked < MAX_VERIFY:
+            ranks = self.best_ranks(lo, hi, count).tolist()
+            for rank in ranks[checked:]:
+                title_index = int(self.by_rank[rank])
+                if self.matches_all(title_index, prefixes):
+                    yield title_index
+            if len(ranks) < count:
+                return
+            checked = len(ranks)
+            count = min(count * 8, MAX_VERIFY)
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """Distinct titles whose words start with the query words, most popular first.
+
+        Titles that start with the whole query come before the others.
+        """
+        prefixes = title_words(query)
+        limit = max(1, min(limit, MAX_LIMIT))
+        if not prefixes:
+            return []
+
+        if len(prefixes) == 1:
+            # Twice the limit, so repeated titles (remakes) do not leave gaps
+            candidates = self.by_rank[self.prefix_ranks(prefixes[0], 2 * limit)].tolist()
+        else:
+            candidates = self.verified_candidates(prefixes)
+
+        found = []
+        seen = set()
+        for title_index in candidates:
+            title = self.titles[title_index]
+            if title not in seen:
+                seen.add(title)
+                found.append(title)
+                if len(found) == limit:
+                    break
+
+        query_lower = query.strip().lower()
+        found.sort(key=lambda title: not title.lower().startswith(query_lower))
+        return found
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ingest import fit_tfidf
+from vocabulary import load_vectorizer, save_vectorizer
+
+TEXTS = pd.Series([
+    "Action Crime Drama batman joker gotham Christian Bale Christopher Nolan",
+    "Action Sci-Fi Thriller dream heist subconscious Leonardo DiCaprio Christopher Nolan",
+    "Crime Drama gangster nonlinear violence John Travolta Quentin Tarantino",
+    "Crime Drama mafia crime family power Al Pacino Francis Ford Coppola",
+    "Drama Romance simple man running love Tom Hanks Robert Zemeckis",
+    "Action Sci-Fi virtual reality chosen one Keanu Reeves The Wachowskis",
+    "Adventure Drama Sci-Fi space time black hole Matthew McConaughey Christopher Nolan",
+    "",
+])
+
+PARAMS = [
+    {},
+    {'norm': 'l1'},
+    {'norm': None},
+    {'use_idf': False},
+    {'smooth_idf': False},
+    {'sublinear_tf': True},
+    {'stop_words': 'english', 'max_features': 20, 'max_df': 0.5, 'ngram_range': (1, 2), 'sublinear_tf': True},
+]
+
+
+@pytest.mark.parametrize('params', PARAMS)
+@pytest.mark.parametrize('chunksize', [3, 100])
+def test_fit_tfidf_matches_tfidf_vectorizer(params, chunksize):
+    expected_vectorizer = TfidfVectorizer(**params)
+    expected = expected_vectorizer.fit_transform(TEXTS)
+
+    vectorizer, matrix = fit_tfidf(TEXTS, params, chunksize)
+
+    assert vectorizer.vocabulary_ == expected_vectorizer.vocabulary_
+    np.testing.assert_allclose(matrix.toarray(), expected.toarray(), rtol=1e-6, atol=1e-12)
+    np.testing.assert_allclose(
+        vectorizer.transform(TEXTS).toarray(), expected.toarray(), rtol=1e-6, atol=1e-12
+    )
+
+
+@pytest.mark.parametrize('params', PARAMS)
+def test_saved_vectorizer_transforms_the_same(params, tmp_path):
+    vectorizer, matrix = fit_tfidf(TEXTS, params)
+    loaded = load_vectorizer(tmp_path, save_vectorizer(tmp_path, vectorizer))
+    np.testing.assert_allclose(loaded.transform(TEXTS).toarray(), matrix.toarray(), rtol=1e-6, atol=1e-12)
@@ -0,0 +1,222 @@
+import difflib
+
+import numpy as np
+
+# ============================================
+# PREBUILT TITLE INDEX
+# ============================================
+# Resolves a search term with the same four tiers simple_movie_search
+# always used (exact -> contains -> word-by-word -> fuzzy) without
+# scanning every title:
+#   exact         lowercase title -> first index (dict, built at load)
+#   contains      character trigram postings, verified on the candidates
+#   word-by-word  trigram postings of the query words
+#   fuzzy         top candidates by shared trigrams, then difflib
+# The trigram postings are built offline and stored as .npy files:
+#   title_grams.keys.npy      int64  sorted trigram codes
+#   title_grams.offsets.npy   int64  posting list boundaries
+#   title_grams.postings.npy  int32  title indices, ascending per trigram
+#   title_short.keys.npy      int64  sorted 1- and 2-character codes
+#   title_short.first.npy     int32  first title containing each code
+
+GRAM_SIZE = 3
+FUZZY_CANDIDATES = 100
+
+
+def gram_code(gram):
+    """Pack up to three characters into one int64 (21 bits per code point)"""
+    code = 0
+    for ch in gram:
+        code = (code << 21) | ord(ch)
+    return code
+
+
+def title_grams(text, n=GRAM_SIZE):
+    """Distinct character n-gram codes of a lowercase string"""
+    return {gram_code(text[i:i + n]) for i in range(len(text) - n + 1)}
+
+
+def _group_postings(codes, indices):
+    """Sort (code, index) pairs and return keys, offsets, postings"""
+    codes = np.asarray(codes, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int32)
+    order = np.lexsort((indices, codes))
+    codes = codes[order]
+    indices = indices[order]
+    keys, starts = np.unique(codes, return_index=True)
+    offsets = np.append(starts, len(codes)).astype(np.int64)
+    return keys, offsets, indices
+
+
+def build_title_index(titles):
+    """Build the trigram and short-gram arrays for a list of titles"""
+    gram_codes, gram_indices = [], []
+    short_codes, short_indices = [], []
+
+    for i, title in enumerate(titles):
+        title_lower = title.lower()
+        grams = title_grams(title_lower)
+        gram_codes.extend(grams)
+        gram_indices.extend([i] * len(grams))
+        short = title_grams(title_lower, 1) | title_grams(title_lower, 2)
+        short_codes.extend(short)
+        short_indices.extend([i] * len(short))
+
+    gram_keys, gram_offsets, gram_postings = _group_postings(gram_codes, gram_indices)
+    short_keys, short_offsets, short_postings = _group_postings(short_codes, short_indices)
+
+    return {
+        'title_grams.keys': gram_keys,
+        'title_grams.offsets': gram_offsets,
+        'title_grams.postings': gram_postings,
+        'title_short.keys': short_keys,
+        # Postings are ascending, so the first entry is the first title
+        'title_short.first': short_postings[short_offsets[:-1]],
+    }
+
+
+def save_title_index(version_dir, titles):
+    """Build the title index and write it next to the other artifacts"""
+    for name, values in build_title_index(titles).items():
+        np.save(version_dir / f"{name}.npy", values)
+
+
+def load_title_index(version_dir, titles, mmap_mode='r'):
+    """Open a title index saved by save_title_index"""
+    arrays = {}
+    for name in ['title_grams.keys', 'title_grams.offsets', 'title_grams.postings',
+                 'title_short.keys', 'title_short.first']:
+        arrays[name] = np.load(version_dir / f"{name}.npy", mmap_mode=mmap_mode)
+    return TitleIndex(titles, arrays)
+
+
+def first_positions(values):
+    """{value: index of its first occurrence}, built in C by zipping backwards"""
+    n = len(values)
+    return dict(zip(reversed(values), range(n - 1, -1, -1)))
+
+
+class TitleIndex:
+    """Four-tier title resolver backed by prebuilt n-gram arrays"""
+
+    def __init__(self, titles, arrays):
+        self.titles = titles
+        self.lower_titles = [t.lower() for t in titles]
+        self.exact = first_positions(self.lower_titles)
+
+        self.gram_keys = arrays['title_grams.keys']
+        self.gram_offsets = arrays['title_grams.offsets']
+        self.gram_postings = arrays['title_grams.postings']
+        self.short_keys = arrays['title_short.keys']
+        self.short_first = arrays['title_short.first']
+
+    # ---------- posting lookups ----------
+    def _postings(self, code):
+        pos = np.searchsorted(self.gram_keys, code)
+        if pos >= len(self.gram_keys) or self.gram_keys[pos] != code:
+            return None
+        return self.gram_postings[self.gram_offsets[pos]:self.gram_offsets[pos + 1]]
+
+    def _substring_candidates(self, text):
+        """Sorted indices of titles that may contain text (len(text) >= 3)"""
+        postings = []
+        for code in title_grams(text):
+            found = self._postings(code)
+            if found is None:
+                return np.empty(0, dtype=np.int32)
+            postings.append(found)
+        postings.sort(key=len)
+        candidates = np.asarray(postings[0])
+        for found in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, found, assume_unique=True)
+        return candidates
+
+    def first_containing(self, text):
+        """Index of the first title containing text, or None"""
+        if not text:
+            return 0 if self.titles else None
+        if len(text) < GRAM_SIZE:
+            code = gram_code(text)
+            pos = np.searchsorted(self.short_keys, code)
+            if pos < len(self.short_keys) and self.short_keys[pos] == code:
+                return int(self.short_first[pos])
+            return None
+        for i in self._substring_candidates(text).tolist():
+            if text in self.lower_titles[i]:
+                return i
+        return None
+
+    # ---------- the four tiers ----------
+    def _word_match(self, search_words):
+        """First title containing all but at most one of the words"""
+        required = len(search_words) - 1
+        if required <= 0:
+            return 0 if self.titles else None
+
+        if len(search_words) == 2:
+            # Either word alone is enough
+            hits = [self.first_containing(w) for w in search_words]
+            hits = [h for h in hits if h is not None]
+            return min(hits) if hits else None
+
+        # Short words have no trigrams, so assume they always match; a title
+        # can only qualify if enough long words may appear in it.
+        short_count = sum(1 for w in search_words if len(w) < GRAM_SIZE)
+        if short_count >= required:
+            candidates = range(len(self.titles))
+        else:
+            word_candidates = {}
+            postings = []
+            for word in search_words:
+                if len(word) < GRAM_SIZE:
+                    continue
+                if word not in word_candidates:
+                    word_candidates[word] = self._substring_candidates(word)
+                postings.append(word_candidates[word])
+            indices, counts = np.unique(np.concatenate(postings), return_counts=True)
+            candidates = indices[counts + short_count >= required].tolist()
+
+        for i in candidates:
+            title_lower = self.lower_titles[i]
+            match_count = sum(1 for word in search_words if word in title_lower)
+            if match_count >= required:
+                return i
+        return None
+
+    def _fuzzy_match(self, search_term):
+        """difflib over the titles sharing the most trigrams with the query"""
+        postings = [self._postings(code) for code in title_grams(search_term.lower())]
+        postings = [p for p in postings if p is not None]
+        if not postings:
+            return None
+        indices, counts = np.unique(np.concatenate(postings), return_counts=True)
+        if len(indices) > FUZZY_CANDIDATES:
+            top = np.argpartition(-counts, FUZZY_CANDIDATES - 1)[:FUZZY_CANDIDATES]
+            indices = indices[top]
+        candidates = [self.titles[i] for i in indices.tolist()]
+        matches = difflib.get_close_matches(search_term, candidates, n=1, cutoff=0.3)
+        return matches[0] if matches else None
+
+    def resolve(self, search_term):
+        """Resolve a search term to a catalog title, or None"""
+        search_lower = search_term.lower().strip()
+
+        # 1. Exact match
+        idx = self.exact.get(search_lower)
+        if idx is not None:
+            return self.titles[idx]
+
+        # 2. Contains match
+        idx = self.first_containing(search_lower)
+        if idx is not None:
+            return self.titles[idx]
+
+        # 3. Word-by-word match (allow 1 missing word)
+        idx = self._word_match(search_lower.split())
+        if idx is not None:
+            return self.titles[idx]
+
+        # 4. Fuzzy match
+        return self._fuzzy_match(search_term)
@@ -1,47 +1,38 @@
+import argparse
 import os
 import sys
 import pandas as pd
-import numpy as np
-import pickle
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent))
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from artifacts import load_artifacts
+from build_model import build
+from neighbors import DEFAULT_TOP_K, DEFAULT_BLOCK_SIZE
 
 # ===== CONFIGURATION =====
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
-MODEL_DIR = BASE_DIR / "model"
+MODELS_DIR = Path(os.environ.get("MODELS_DIR", BASE_DIR / "models"))
+
+TFIDF_PARAMS = {
+    'stop_words': 'english',
+    'max_features': 5000,
+    'ngram_range': (1, 2),
+}
+
+# Similarity build: rows per block, worker processes (-1 = all cores) and
+# an optional memory budget (MB) that overrides the block size
+TOP_K = int(os.environ.get("TOP_K", DEFAULT_TOP_K))
+BLOCK_SIZE = int(os.environ.get("BLOCK_SIZE", DEFAULT_BLOCK_SIZE))
+N_JOBS = int(os.environ.get("N_JOBS", -1))
+MEMORY_BUDGET_MB = int(os.environ.get("MEMORY_BUDGET_MB", 0))
 
 print("="*60)
 print("🎬 MOVIE RECOMMENDATION MODEL TRAINING")
 print("="*60)
 
-def load_and_prepare_data():
-    """Load and prepare movie data"""
-    print("\n📂 Loading movie data...")
-    
-    # Check for data file
-    csv_path = DATA_DIR / "movies.csv"
-    if not csv_path.exists():
-        print(f"❌ Error: Data file not found at {csv_path}")
-        print(f"Please place your 'movies.csv' file in the {DATA_DIR} directory")
-        print("\n📝 Creating sample dataset for testing...")
-        return create_sample_dataset()
-    
-    # Load the CSV file
-    try:
-        movies_df = pd.read_csv(csv_path)
-        print(f"✅ Loaded {len(movies_df)} movies from {csv_path}")
-        return movies_df
-    except Exception as e:
-        print(f"❌ Error loading CSV file: {e}")
-        print("\n📝 Creating sample dataset instead...")
-        return create_sample_dataset()
-
 def create_sample_dataset():
     """Create a sample dataset for testing"""
     print("Creating sample movie dataset...")
@@ -132,107 +123,14 @@ def create_sample_dataset():
     print(f"✅ Created sample dataset with {len(movies_df)} movies")
     
     # Save sample dataset
+    DATA_DIR.mkdir(exist_ok=True)
     sample_csv_path = DATA_DIR / "movies_sample.csv"
     movies_df.to_csv(sample_csv_path, index=False)
     print(f"💾 Sample dataset saved to {sample_csv_path}")
     
     return movies_df
 
-def preprocess_data(movies_df):
-    """Preprocess the movie data"""
-    print("\n🔄 Preprocessing data...")
-    
-    # Ensure required columns
-    required_columns = ['title', 'genres']
-    for col in required_columns:
-        if col not in movies_df.columns:
-            raise ValueError(f"Missing required column: {col}")
-    
-    # Create missing columns with default values
-    optional_columns = {
-        'keywords': '',
-        'tagline': '',
-        'cast': '',
-        'director': '',
-        'year': '',
-        'popularity': 0
-    }
-    
-    for col, default_value in optional_columns.items():
-        if col not in movies_df.columns:
-            movies_df[col] = default_value
-    
-    # Fill NaN values
-    movies_df.fillna('', inplace=True)
-    
-    # Reset index
-    movies_df.reset_index(drop=True, inplace=True)
-    movies_df['index'] = movies_df.index
-    
-    # Combine features for similarity calculation
-    print("   Combining features...")
-    feature_columns = ['genres', 'keywords', 'tagline', 'cast', 'director']
-    movies_df['combined_features'] = movies_df[feature_columns].apply(
-        lambda row: ' '.join(str(val) for val in row if val), axis=1
-    )
-    
-    print(f"✅ Preprocessed {len(movies_df)} movies")
-    return movies_df
-
-def train_model(movies_df):
-    """Train the recommendation model"""
-    print("\n🧠 Training model...")
-    
-    # Initialize TF-IDF Vectorizer
-    print("   Creating TF-IDF vectors...")
-    vectorizer = TfidfVectorizer(
-        stop_words='english',
-        max_features=5000,
-        ngram_range=(1, 2)
-    )
-    
-    # Transform text to feature vectors
-    tfidf_matrix = vectorizer.fit_transform(movies_df['combined_features'])
-    print(f"   Created TF-IDF matrix: {tfidf_matrix.shape}")
-    
-    # Calculate cosine similarity matrix
-    print("   Calculating similarity matrix...")
-    similarity_matrix = cosine_similarity(tfidf_matrix, tfidf_matrix)
-    print(f"   Similarity matrix shape: {similarity_matrix.shape}")
-    
-    return vectorizer, similarity_matrix
-
-def save_model(movies_df, vectorizer, similarity_matrix):
-    """Save the trained model"""
-    print("\n💾 Saving model...")
-    
-    # Ensure model directory exists
-    MODEL_DIR.mkdir(exist_ok=True)
-    
-    # Save similarity matrix
-    similarity_path = MODEL_DIR / "similarity_matrix.npy"
-    np.save(similarity_path, similarity_matrix)
-    print(f"   ✓ Similarity matrix saved to {similarity_path}")
-    
-    # Save vectorizer
-    vectorizer_path = MODEL_DIR / "vectorizer.pkl"
-    with open(vectorizer_path, 'wb') as f:
-        pickle.dump(vectorizer, f)
-    print(f"   ✓ Vectorizer saved to {vectorizer_path}")
-    
-    # Save movie data
-    movies_path = MODEL_DIR / "movies_data.pkl"
-    movies_df.to_pickle(movies_path)
-    print(f"   ✓ Movie data saved to {movies_path}")
-    
-    # Also save as CSV for easy inspection
-    movies_csv_path = MODEL_DIR / "movies_processed.csv"
-    movies_df.to_csv(movies_csv_path, index=False)
-    print(f"   ✓ Processed data saved to {movies_csv_path}")
-    
-    print("✅ Model saved successfully!")
-
-def test_model(movies_df, similarity_matrix):
+def test_model(movies_df, neighbor_indices, neighbor_scores):
     """Test the trained model"""
     print("\n🧪 Testing model...")
     
@@ -246,11 +144,12 @@ def test_model(movies_df, similarity_matrix):
     
     movie_idx = movie_idx[0]
     
-    # Get similarity scores
-    similarity_scores = list(enumerate(similarity_matrix[movie_idx]))
-    
-    # Sort by similarity
-    sorted_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)[1:6]  # Top 5
+    # Neighbors are already sorted by similarity
+    sorted_scores = [
+        (idx, score)
+        for idx, score in zip(neighbor_indices[movie_idx], neighbor_scores[movie_idx])
+        if idx >= 0
+    ][:5]  # Top 5
     
     print(f"   Top 5 recommendations for '{test_movie}':")
     for idx, score in sorted_scores:
@@ -259,31 +158,56 @@ def test_model(movies_df, similarity_matrix):
     
     print("✅ Model test completed!")
 
-def main():
-    """Main training function"""
+def train_model(csv_path, models_dir=MODELS_DIR, top_k=TOP_K, block_size=BLOCK_SIZE, n_jobs=N_JOBS,
+                memory_budget_mb=MEMORY_BUDGET_MB, force=False, cache=None):
+    """Train the recommendation model: build() with this script's TF-IDF settings.
+
+    Returns the directory of the published artifact version.
+    """
+    return build(
+        csv_path, models_dir, top_k=top_k, block_size=block_size, n_jobs=n_jobs,
+        memory_budget_mb=memory_budget_mb, tfidf_params=TFIDF_PARAMS, force=force, cache=cache
+    )
+
+def main(argv=None):
+    """Main training function: train_model() on data/movies.csv, then a quick test"""
+    parser = argparse.ArgumentParser(description="Train the movie recommendation model")
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="Neighbors kept per movie")
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help="Rows per similarity block")
+    parser.add_argument('--n-jobs', type=int, default=N_JOBS, help="Worker processes (-1 = all cores)")
+    parser.add_argument('--memory-budget-mb', type=int, default=MEMORY_BUDGET_MB,
+                        help="Score memory budget for all workers (overrides --block-size)")
+    parser.add_argument('--force', action='store_true', help="Rerun every stage instead of reusing cached outputs")
+    args = parser.parse_args(argv)
+    
     try:
-        # Step 1: Load data
-        movies_df = load_and_prepare_data()
-        
-        # Step 2: Preprocess data
-        movies_df = preprocess_data(movies_df)
-        
-        # Step 3: Train model
-        vectorizer, similarity_matrix = train_model(movies_df)
+        # Step 1: Find data
+        csv_path = DATA_DIR / "movies.csv"
+        if not csv_path.exists():
+            print(f"❌ Error: Data file not found at {csv_path}")
+            print(f"Please place your 'movies.csv' file in the {DATA_DIR} directory")
+            print("\n📝 Creating sample dataset for testing...")
+            create_sample_dataset()
+            csv_path = DATA_DIR / "movies_sample.csv"
         
-        # Step 4: Save model
-        save_model(movies_df, vectorizer, similarity_matrix)
+        # Steps 2-4: ingest, preprocess, train and save (cached stages)
+        version_dir = train_model(
+            csv_path, top_k=args.top_k, block_size=args.block_size, n_jobs=args.n_jobs,
+            memory_budget_mb=args.memory_budget_mb, force=args.force
+        )
         
         # Step 5: Test model
-        test_model(movies_df, similarity_matrix)
+        artifacts = load_artifacts(MODELS_DIR, version_dir.name)
+        movies_df = pd.DataFrame({'title': artifacts['catalog']['title'].tolist()})
+        test_model(movies_df, artifacts['neighbor_indices'], artifacts['neighbor_scores'])
         
         # Summary
         print("\n" + "="*60)
         print("🎉 MODEL TRAINING COMPLETE!")
         print("="*60)
         print(f"📊 Total movies: {len(movies_df)}")
-        print(f"🔧 Features used: genres, keywords, tagline, cast, director")
-        print(f"📁 Model saved in: {MODEL_DIR}")
+        print(f"🔧 Features used: {', '.join(artifacts['available_features'])}")
+        print(f"📁 Model saved in: {version_dir}")
         print(f"🌐 To use the model, run: python app.py")
         print("="*60)
         
@@ -297,4 +221,4 @@ def main():
 
 if __name__ == '__main__':
     success = main()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(0 if success else 1)
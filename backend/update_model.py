@@ -0,0 +1,308 @@
+import argparse
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.append(str(Path(__file__).parent))
+
+from ann import update_ann_index
+from artifacts import get_current_version, load_artifacts, save_artifacts, set_current_version
+from build_model import TFIDF_PARAMS, preprocess_movies, fit_model, fit_manifest, fit_ann, ann_manifest, oov_counts
+from catalog import catalog_frame
+from ingest import combine_features
+from neighbors import DEFAULT_BLOCK_SIZE, update_neighbor_index
+from vocabulary import constructor_params, fit_params
+
+# ============================================
+# INCREMENTAL CATALOG UPDATES
+# ============================================
+# Appends new movies or updates existing ones without refitting TF-IDF:
+# new rows are transformed with the fitted vocabulary, only their
+# neighbors are computed, and the affected neighbor lists are patched. A
+# full refit only happens when the new text drifts too far from the
+# fitted vocabulary.
+#
+# Every row is a new movie, even when a movie with that title exists (a
+# remake); a row with a true `update` column updates the first movie with
+# its exact title instead. Empty cells of an update row keep the stored
+# value. Rows are applied in order, so several updates of one movie in a
+# batch leave the last one.
+#
+# Drift is the share of the catalog text (estimated at the last full fit)
+# made of tokens the vocabulary cannot represent, beyond the OOV rate the
+# fit itself already had. It accumulates over incremental updates.
+#
+# Updates of one models directory are serialized with a file lock, so two
+# concurrent updates never start from the same CURRENT and drop each
+# other's movies. CURRENT is checked again before publishing, in case a
+# build or a reload moved it in the meantime.
+#
+#   python update_model.py new_movies.csv [--drift-threshold 0.05] [--refit]
+
+BASE_DIR = Path(__file__).parent
+MODELS_DIR = Path(os.environ.get("MODELS_DIR", BASE_DIR / "models"))
+
+# Allowed share of unrepresentable catalog text before refitting
+DEFAULT_DRIFT_THRESHOLD = float(os.environ.get("DRIFT_THRESHOLD", 0.05))
+LOCK_FILE = ".update.lock"
+# Column marking rows that replace an existing movie
+UPDATE_COLUMN = "update"
+TRUE_STRINGS = {'1', 'true', 'yes', 'y'}
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    # msvcrt gives up after ~10 seconds, keep waiting like flock
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def update_lock(models_dir):
+    """Hold the exclusive update lock of a models directory (blocks until free).
+
+    An OS file lock (flock, or msvcrt on Windows) is released by the OS
+    if the process dies, so a crashed update never leaves it stuck.
+    """
+    with open(Path(models_dir) / LOCK_FILE, 'a+') as f:
+        f.seek(0)
+        _lock_file(f)
+        try:
+            yield
+        finally:
+            _unlock_file(f)
+
+
+def refit_params(manifest):
+    """TF-IDF parameters the current version was fitted with.
+
+    Versions written before the pruning parameters were recorded fall
+    back to those of TFIDF_PARAMS.
+    """
+    pruning = manifest.get('tfidf_fit_params', fit_params(TFIDF_PARAMS))
+    return dict(constructor_params(manifest['vectorizer']['params']), **pruning)
+
+
+def update_flags(new_movies):
+    """Boolean array of the rows that update an existing movie"""
+    if UPDATE_COLUMN not in new_movies.columns:
+        return np.zeros(len(new_movies), dtype=bool)
+    return np.array([
+        value is True or str(value).strip().lower() in TRUE_STRINGS
+        # 1 becomes 1.0 in a column with missing cells
+        or (isinstance(value, (int, float)) and value == 1)
+        for value in new_movies[UPDATE_COLUMN].tolist()
+    ], dtype=bool)
+
+
+def merge_movies(current, new_movies, features):
+    """Apply raw new rows to the current catalog frame.
+
+    Rows flagged by update_flags update the first movie with the same
+    title (ValueError if there is none): only the columns the row gives a
+    value for change, the others keep the stored value. All other rows
+    are appended. Returns the merged frame and the indices of the rows
+    that changed.
+    """
+    flags = update_flags(new_movies)
+    additions, _ = preprocess_movies(new_movies[~flags], features)
+
+    title_to_index = {}
+    for i, title in enumerate(current['title'].tolist()):
+        title_to_index.setdefault(title, i)
+
+    merged = current.copy()
+    changed = []
+    for row in new_movies[flags].to_dict('records'):
+        idx = title_to_index.get(row['title'])
+        if idx is None:
+            raise ValueError(f"Cannot update '{row['title']}': no movie with this title")
+        given = {name: value for name, value in row.items() if name != UPDATE_COLUMN and not pd.isna(value)}
+        if any(feature in given for feature in features):
+            # The catalog only keeps some feature columns, the others
+            # cannot be recombined without the row giving them again
+            lacking = [f for f in features if f not in given and f not in merged.columns]
+            if lacking:
+                raise ValueError(
+                    f"Cannot update '{row['title']}': a row changing the features "
+                    f"must also give {', '.join(lacking)}"
+                )
+            row_features = pd.DataFrame([{
+                feature: str(given[feature] if feature in given else merged.at[idx, feature])
+                for feature in features
+            }])
+            given['combined_features'] = combine_features(row_features, features).iloc[0]
+        for name, value in given.items():
+            if name in merged.columns:
+                merged.at[idx, name] = value
+        changed.append(idx)
+
+    if len(additions):
+        changed.extend(range(len(merged), len(merged) + len(additions)))
+        merged = pd.concat([merged, additions.reindex(columns=merged.columns)], ignore_index=True)
+    for name in merged.columns:
+        if merged[name].dtype == object:
+            merged[name] = merged[name].fillna('')
+    return merged, sorted(set(changed))
+
+
+def update_catalog(models_dir, new_movies, drift_threshold=DEFAULT_DRIFT_THRESHOLD,
+                   force_refit=False, block_size=DEFAULT_BLOCK_SIZE):
+    """Apply new/updated movies and publish a new artifact version.
+
+    Returns a summary dict with the new version and the update mode.
+    """
+    models_dir = Path(models_dir)
+    with update_lock(models_dir):
+        return _update_catalog(models_dir, new_movies, drift_threshold, force_refit, block_size)
+
+
+def _update_catalog(models_dir, new_movies, drift_threshold, force_refit, block_size):
+    bundle = load_artifacts(models_dir)
+    manifest = bundle['manifest']
+    vectorizer = bundle['vectorizer']
+    features = manifest['features_used']
+
+    if 'title' not in new_movies.columns:
+        raise ValueError("Missing required column: title")
+    new_movies = new_movies.dropna(subset=['title'])
+    new_movies = new_movies.assign(title=new_movies['title'].astype(str)).reset_index(drop=True)
+
+    current = catalog_frame(bundle['catalog'])
+    merged, changed = merge_movies(current, new_movies, features)
+    n_added = len(merged) - len(current)
+
+    # Vocabulary drift of the incoming text against the fitted vocabulary
+    fit_info = {
+        key: manifest[key]
+        for key in ['fitted_movies', 'fitted_tokens', 'baseline_oov_rate', 'excess_oov_tokens']
+        if key in manifest
+    }
+    if len(fit_info) < 4:
+        # Artifacts without fit statistics (e.g. from generate_model.py)
+        fit_info = fit_manifest(vectorizer, current)
+    missing, total, _ = oov_counts(vectorizer, merged['combined_features'].iloc[changed])
+    excess = fit_info['excess_oov_tokens'] + max(0.0, missing - fit_info['baseline_oov_rate'] * total)
+    drift = excess / max(fit_info['fitted_tokens'], 1)
+
+    summary = {
+        'added': int(n_added),
+        'updated': int(len(changed) - n_added),
+        'drift': round(float(drift), 4),
+    }
+
+    if force_refit or drift > drift_threshold:
+        print(f"\n🔁 Vocabulary drift {drift:.3f} > {drift_threshold}: full refit")
+        tfidf_params = refit_params(manifest)
+        vectorizer, tfidf_matrix, neighbor_indices, neighbor_scores = fit_model(
+            merged, top_k=int(manifest['top_k']), block_size=block_size, tfidf_params=tfidf_params
+        )
+        extra_manifest = dict(fit_manifest(vectorizer, merged), tfidf_fit_params=fit_params(tfidf_params))
+        summary['mode'] = 'full_refit'
+    else:
+        print(f"\n➕ Incremental update of {len(changed)} movies (drift {drift:.3f})")
+        new_rows = sparse.csr_matrix(
+            vectorizer.transform(merged['combined_features'].iloc[changed]), dtype=np.float32
+        )
+        # Row i of the new matrix comes from the old matrix, or from new_rows
+        old_matrix = sparse.csr_matrix(bundle['tfidf_matrix'], dtype=np.float32)
+        stacked = sparse.vstack([old_matrix, new_rows], format='csr')
+        source = np.arange(len(merged))
+        source[len(current):] = 0
+        source[changed] = old_matrix.shape[0] + np.arange(len(changed))
+        tfidf_matrix = stacked[source]
+
+        neighbor_indices, neighbor_scores = update_neighbor_index(
+            tfidf_matrix, np.asarray(bundle['neighbor_indices']),
+            np.asarray(bundle['neighbor_scores']), changed, block_size=block_size
+        )
+        extra_manifest = dict(
+            fit_info,
+            tfidf_fit_params=fit_params(refit_params(manifest)),
+            excess_oov_tokens=excess,
+            incremental_updates=manifest.get('incremental_updates', 0) + 1,
+        )
+        summary['mode'] = 'incremental'
+
+    # Keep the optional ANN engine in step with the catalog
+    ann_arrays = None
+    if 'ann' in manifest:
+        if summary['mode'] == 'full_refit':
+            ann_arrays, extra_manifest['ann'] = fit_ann(
+                tfidf_matrix, neighbor_indices,
+                n_components=manifest['ann']['components'], n_lists=manifest['ann']['lists']
+            )
+        else:
+            ann_arrays = update_ann_index(bundle['ann_index'].arrays, tfidf_matrix, changed)
+            extra_manifest['ann'] = ann_manifest(ann_arrays, tfidf_matrix, neighbor_indices)
+
+    version_dir = save_artifacts(
+        models_dir, merged, vectorizer, neighbor_indices, neighbor_scores,
+        features, tfidf_matrix, extra_manifest=extra_manifest, ann_arrays=ann_arrays, publish=False
+    )
+    if get_current_version(models_dir) != manifest['version']:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise RuntimeError(
+            f"CURRENT moved away from {manifest['version']} during the update, nothing was published"
+        )
+    set_current_version(models_dir, version_dir.name)
+    summary['version'] = version_dir.name
+    print(f"✅ New artifact version {version_dir.name} "
+          f"({summary['added']} added, {summary['updated']} updated)")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add or update movies without a full retrain")
+    parser.add_argument('csv', help="CSV with the new or changed movies (same columns as movies.csv, "
+                                    "plus `update` = true for rows updating a movie of the same title)")
+    parser.add_argument('--models-dir', default=str(MODELS_DIR), help="Artifact directory")
+    parser.add_argument('--drift-threshold', type=float, default=DEFAULT_DRIFT_THRESHOLD,
+                        help="Allowed share of unrepresentable text before a full refit")
+    parser.add_argument('--refit', action='store_true', help="Always do a full refit")
+    args = parser.parse_args(argv)
+
+    print("="*60)
+    print("🎬 UPDATING MOVIE CATALOG")
+    print("="*60)
+
+    csv_path = Path(args.csv)
+    if not csv_path.exists():
+        print(f"❌ ERROR: {csv_path} not found!")
+        return False
+
+    update_catalog(Path(args.models_dir), pd.read_csv(csv_path),
+                   drift_threshold=args.drift_threshold, force_refit=args.refit)
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
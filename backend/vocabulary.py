@@ -0,0 +1,94 @@
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+
+from catalog import encode_strings
+
+# ============================================
+# PICKLE-FREE FITTED VECTORIZER
+# ============================================
+# A fitted TfidfVectorizer is fully described by its constructor
+# parameters, its vocabulary and its idf weights. They are stored as
+#   vocabulary.data.npy / vocabulary.offsets.npy  terms in column order (UTF-8 blob)
+#   idf.npy                                       float64 idf per column
+# plus the parameters in the manifest, so loading does not unpickle
+# anything and does not depend on the sklearn version that built it.
+
+# Parameters that only matter while fitting (the vocabulary is already pruned)
+FIT_ONLY_PARAMS = {'max_df', 'min_df', 'max_features', 'vocabulary'}
+
+
+def vectorizer_params(vectorizer):
+    """JSON-serializable constructor parameters of a fitted vectorizer"""
+    params = {}
+    for name, value in vectorizer.get_params().items():
+        if name in FIT_ONLY_PARAMS:
+            continue
+        if callable(value) and name in ('preprocessor', 'tokenizer', 'analyzer'):
+            raise ValueError(f"Cannot store a vectorizer with a custom {name}")
+        if name == 'dtype':
+            value = np.dtype(value).name
+        elif isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        elif isinstance(value, tuple):
+            value = list(value)
+        params[name] = value
+    return params
+
+
+def set_idf(vectorizer, idf):
+    """Complete a vectorizer whose vocabulary_ is set with its idf weights.
+
+    With use_idf=False there are no weights (sklearn refuses to set them),
+    so only the weighting step is fitted and `idf` is ignored.
+    """
+    if vectorizer.use_idf:
+        vectorizer.idf_ = idf
+        return vectorizer
+    vectorizer._tfidf = TfidfTransformer(
+        norm=vectorizer.norm, use_idf=False,
+        smooth_idf=vectorizer.smooth_idf, sublinear_tf=vectorizer.sublinear_tf
+    ).fit(sparse.csr_matrix((1, len(vectorizer.vocabulary_))))
+    return vectorizer
+
+
+def fit_params(tfidf_params):
+    """The pruning parameters of a TF-IDF configuration (kept in the manifest for refits)"""
+    return {name: value for name, value in tfidf_params.items() if name in FIT_ONLY_PARAMS - {'vocabulary'}}
+
+
+def constructor_params(params):
+    """TfidfVectorizer keyword arguments from the parameters stored by vectorizer_params"""
+    params = dict(params)
+    params['dtype'] = np.dtype(params['dtype']).type
+    if isinstance(params.get('ngram_range'), list):
+        params['ngram_range'] = tuple(params['ngram_range'])
+    return params
+
+
+def save_vectorizer(version_dir, vectorizer):
+    """Write the vocabulary and idf arrays; returns the manifest entry"""
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[column] = term
+    data, offsets = encode_strings(terms)
+    np.save(version_dir / "vocabulary.data.npy", data)
+    np.save(version_dir / "vocabulary.offsets.npy", offsets)
+    # All ones without idf weighting, so every version has the same files
+    idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(len(terms))
+    np.save(version_dir / "idf.npy", np.asarray(idf, dtype=np.float64))
+    return {'params': vectorizer_params(vectorizer), 'terms': len(terms)}
+
+
+def load_vectorizer(version_dir, saved):
+    """Rebuild the fitted TfidfVectorizer written by save_vectorizer"""
+    vectorizer = TfidfVectorizer(**constructor_params(saved['params']))
+
+    data = np.load(version_dir / "vocabulary.data.npy")
+    offsets = np.load(version_dir / "vocabulary.offsets.npy").tolist()
+    raw = data.tobytes()
+    terms = [raw[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])]
+    if len(terms) != saved['terms']:
+        raise ValueError(f"Vocabulary has {len(terms)} terms, manifest says {saved['terms']}")
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+    return set_idf(vectorizer, np.load(version_dir / "idf.npy"))
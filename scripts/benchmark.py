@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Generates synthetic catalogs and times the hot paths on each of them:
+
+    build_model      python backend/build_model.py (offline artifact build)
+    train_model      train_model.train_model from a cold stage cache, plus one
+                     train.<stage> row per pipeline stage
+    search           simple_movie_search
+    recommend        get_recommendations
+    recommend_route  POST /recommend through the Flask test client
+
+For every benchmark it reports p50/p99 latency, throughput, peak RSS and
+artifact size, and writes everything to a JSON file so runs can be
+compared across commits. Every stage runs in its own process, so peak
+RSS belongs to that stage only. Result caches are disabled so every
+request does the full work.
+
+Usage:
+    python scripts/benchmark.py [--sizes 1000,10000,100000] [--queries 500]
+                                [--output benchmark-results.json] [--workdir /tmp/movie-bench]
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend"
+
+DEFAULT_SIZES = "1000,10000"
+DEFAULT_QUERIES = 500
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Drama',
+          'Family', 'Fantasy', 'Horror', 'Romance', 'Sci-Fi', 'Thriller']
+TITLE_WORDS = ['dark', 'knight', 'star', 'war', 'return', 'love', 'night', 'city', 'dream',
+               'lost', 'king', 'black', 'red', 'man', 'woman', 'story', 'last', 'first',
+               'secret', 'house', 'river', 'shadow', 'empire', 'island', 'storm', 'heart']
+
+
+# ============================================
+# SYNTHETIC CATALOG
+# ============================================
+def generate_catalog(n_movies, csv_path, seed=42):
+    """Write a movies.csv with topic structure (similar movies share words, cast, director)"""
+    rng = random.Random(seed)
+    n_topics = max(10, n_movies // 100)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['title', 'genres', 'keywords', 'tagline', 'cast', 'director', 'year', 'popularity'])
+        for i in range(n_movies):
+            topic = rng.randrange(n_topics)
+            words = ' '.join(rng.choice(TITLE_WORDS).capitalize() for _ in range(rng.randint(1, 4)))
+            # Most titles are unique, some repeat (remakes)
+            title = words if rng.random() < 0.2 else f"{words} {i}"
+            keywords = [f"kw{topic * 20 + rng.randrange(20)}" if rng.random() < 0.8
+                        else f"kw{rng.randrange(n_topics * 20)}" for _ in range(6)]
+            cast = [f"Actor{topic * 12 + rng.randrange(12)}" if rng.random() < 0.6
+                    else f"Actor{rng.randrange(n_topics * 12)}" for _ in range(4)]
+            writer.writerow([
+                title,
+                '|'.join(rng.sample(GENRES, rng.randint(1, 3))),
+                '|'.join(keywords),
+                f"A story about {keywords[0]} and {keywords[1]}",
+                '|'.join(cast),
+                f"Director{topic * 2 + rng.randrange(2)}",
+                rng.randint(1950, 2024),
+                round(rng.random() * 100, 2),
+            ])
+
+
+def benchmark_queries(titles, n_queries, seed=42):
+    """Exact titles, substrings, single words and typos, like real searches"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        title = rng.choice(titles)
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(title)
+        elif kind < 0.7:
+            start = rng.randrange(max(1, len(title) - 4))
+            queries.append(title[start:start + rng.randint(4, 10)].lower())
+        elif kind < 0.9:
+            queries.append(rng.choice(title.split()))
+        else:
+            pos = rng.randrange(len(title))
+            queries.append(title[:pos] + title[pos + 1:])
+    return queries
+
+
+# ============================================
+# MEASUREMENT HELPERS
+# ============================================
+def peak_rss_mb():
+    """Peak resident memory of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def directory_size_mb(path):
+    """Total size of the files under a directory"""
+    path = Path(path)
+    if not path.exists():
+        return 0.0
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file()) / (1024 * 1024)
+
+
+def latency_stats(latencies):
+    """p50/p99 (ms) and throughput (ops/s) of a list of durations in seconds"""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+    return {
+        'n': len(ordered),
+        'p50_ms': round(percentile(0.50), 4),
+        'p99_ms': round(percentile(0.99), 4),
+        'throughput_per_s': round(len(ordered) / total, 2) if total else None,
+    }
+
+
+def timed_calls(func, args_list):
+    """Duration of func(*args) for every args tuple"""
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# ============================================
+# STAGES (each runs in its own process)
+# ============================================
+def stage_build(csv_path, workdir, n_queries):
+    """Offline artifact build that the serving stages load"""
+    from build_model import build
+
+    models_dir = workdir / "models"
+    shutil.rmtree(models_dir, ignore_errors=True)
+    start = time.perf_counter()
+    version_dir = build(csv_path, models_dir)
+    elapsed = time.perf_counter() - start
+    n_movies = json.loads((version_dir / "manifest.json").read_text())['total_movies']
+    return [dict(
+        benchmark='build_model', n=1, p50_ms=round(elapsed * 1000, 1), p99_ms=round(elapsed * 1000, 1),
+        throughput_per_s=round(n_movies / elapsed, 1), artifact_mb=round(directory_size_mb(version_dir), 2)
+    )]
+
+
+def stage_train(csv_path, workdir, n_queries):
+    """train_model.train_model (one worker) with an empty stage cache"""
+    from pipeline import StageCache
+    from train_model import train_model
+
+    models_dir = workdir / "train_model"
+    shutil.rmtree(models_dir, ignore_errors=True)
+    cache = StageCache(models_dir / ".cache")
+    start = time.perf_counter()
+    version_dir = train_model(csv_path, models_dir, n_jobs=1, cache=cache)
+    elapsed = time.perf_counter() - start
+    n_movies = json.loads((version_dir / "manifest.json").read_text())['total_movies']
+    artifact_mb = round(directory_size_mb(version_dir), 2)
+    timings = [('train_model', elapsed)] + [(f"train.{stage}", seconds) for stage, _, seconds in cache.timings]
+    return [dict(
+        benchmark=name, n=1, p50_ms=round(seconds * 1000, 1), p99_ms=round(seconds * 1000, 1),
+        throughput_per_s=round(n_movies / seconds, 1) if seconds else None, artifact_mb=artifact_mb
+    ) for name, seconds in timings]
+
+
+def stage_serve(csv_path, workdir, n_queries):
+    """Search and recommendation latency against the built artifacts"""
+    os.environ.update(
+        MODELS_DIR=str(workdir / "models"), QUERY_CACHE_SIZE='0', RESULT_CACHE_SIZE='0',
+        RELOAD_INTERVAL='0'
+    )
+    import app
+
+    model = app.current_model
+    artifact_mb = round(directory_size_mb(workdir / "models" / model.version), 2)
+    queries = benchmark_queries(model.all_titles, n_queries)
+    client = app.app.test_client()
+
+    def recommend_route(query):
+        response = client.post('/recommend', json={'movie_name': query})
+        response.get_data()
+
+    benchmarks = {
+        'search': (app.simple_movie_search, [(model, q) for q in queries]),
+        'recommend': (app.get_recommendations, [(q,) for q in queries]),
+        'recommend_route': (recommend_route, [(q,) for q in queries]),
+    }
+    results = []
+    for name, (func, args_list) in benchmarks.items():
+        timed_calls(func, args_list[:20])  # warm-up
+        results.append(dict(latency_stats(timed_calls(func, args_list)),
+                            benchmark=name, artifact_mb=artifact_mb))
+    return results
+
+
+STAGES = {'build': stage_build, 'train': stage_train, 'serve': stage_serve}
+
+
+def run_stage(stage, csv_path, workdir, n_queries):
+    """Child process entry point: run one stage and print its results as JSON"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = STAGES[stage](Path(csv_path), Path(workdir), n_queries)
+    peak = round(peak_rss_mb(), 1)
+    for result in results:
+        result['peak_rss_mb'] = peak
+    print(json.dumps(results))
+
+
+def git_commit():
+    """Current commit, to compare result files across commits"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search, recommend and training")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma-separated catalog sizes (1k-500k)")
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES, help="Queries per serving benchmark")
+    parser.add_argument('--stages', default='build,train,serve', help="Stages to run")
+    parser.add_argument('--output', default='benchmark-results.json', help="JSON result file")
+    parser.add_argument('--workdir', default=None, help="Where catalogs and artifacts go (default: temp dir)")
+    parser.add_argument('--stage', choices=sorted(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage(args.stage, args.csv, args.workdir, args.queries)
+        return True
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="movie-bench-"))
+    stages = [s for s in args.stages.split(',') if s]
+    if 'serve' in stages and 'build' not in stages:
+        stages.insert(0, 'build')
+
+    report = {
+        'commit': git_commit(),
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'queries': args.queries,
+        'results': [],
+    }
+    print(f"{'movies':>8} {'benchmark':<16} {'p50 ms':>10} {'p99 ms':>10} {'ops/s':>10} "
+          f"{'peak MB':>8} {'artifacts MB':>13}")
+
+    for size in [int(n) for n in args.sizes.split(',')]:
+        size_dir = workdir / f"{size}"
+        size_dir.mkdir(parents=True, exist_ok=True)
+        csv_path = size_dir / "movies.csv"
+        if not csv_path.exists():
+            generate_catalog(size, csv_path)
+
+        for stage in stages:
+            output = subprocess.run(
+                [sys.executable, __file__, '--stage', stage, '--csv', str(csv_path),
+                 '--workdir', str(size_dir), '--queries', str(args.queries)],
+                check=True, capture_output=True, text=True, cwd=ROOT
+            ).stdout
+            for result in json.loads(output.strip().splitlines()[-1]):
+                result['movies'] = size
+                report['results'].append(result)
+                print(f"{size:>8} {result['benchmark']:<16} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+                      f"{result['throughput_per_s'] or 0:>10.1f} {result['peak_rss_mb']:>8.1f} "
+                      f"{result['artifact_mb']:>13.2f}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Starts the production server (gunicorn -c backend/gunicorn.conf.py) with
+an increasing number of workers and measures requests per second and
+latency of /recommend under concurrent clients.
+
+Result caches are disabled by default so every request does the full
+search + recommendation work.
+
+Usage:
+    python scripts/load_test.py [--workers 1,2,4] [--threads 4] [--clients 16] [--duration 10]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_ready(url, timeout=120):
+    """Poll the server until it answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def client_loop(port, titles, offset, stop_at, latencies, errors):
+    """One keep-alive client sending /recommend requests until stop_at"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    i = offset
+    while time.perf_counter() < stop_at:
+        body = json.dumps({'movie_name': titles[i % len(titles)]})
+        i += 1
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/recommend', body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except Exception as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def run_load(port, titles, clients, duration):
+    """Requests per second and latency percentiles for one server"""
+    latencies = []
+    errors = []
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client_loop, args=(port, titles, n * 997, stop_at, latencies, errors))
+        for n in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / duration,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the production server")
+    default_workers = ','.join(str(n) for n in sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument('--workers', default=default_workers, help="Comma-separated worker counts")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker")
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent client connections")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per run")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--with-cache', action='store_true', help="Keep the result caches enabled")
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}, {args.clients} clients, {args.duration:.0f}s per run")
+    print(f"{'workers':>8} {'threads':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+    for n_workers in [int(n) for n in args.workers.split(',')]:
+        env = dict(os.environ, WEB_CONCURRENCY=str(n_workers), THREADS=str(args.threads),
+                   PORT=str(args.port))
+        if not args.with_cache:
+            env.update(QUERY_CACHE_SIZE='0', RESULT_CACHE_SIZE='0')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'backend/gunicorn.conf.py', 'backend.app:app'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            if not wait_until_ready(base_url + "/debug"):
+                print("❌ Server did not start")
+                return False
+            titles = json.loads(urllib.request.urlopen(base_url + "/movies").read())['movies']
+
+            run_load(args.port, titles, args.clients, 1)  # warm-up
+            result = run_load(args.port, titles, args.clients, args.duration)
+            print(f"{n_workers:>8} {args.threads:>8} {result['rps']:>9.1f} "
+                  f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
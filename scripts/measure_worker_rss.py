@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Worker Memory Measurement
+Starts gunicorn with N workers and reports RSS / PSS / private memory
+of every worker (Linux only, reads /proc/<pid>/smaps_rollup).
+
+Usage:
+    python scripts/measure_worker_rss.py [--workers 4] [--no-preload]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_smaps_rollup(pid):
+    """Return RSS, PSS and private memory of a process in MB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':'):
+                values[parts[0][:-1]] = int(parts[1])
+    private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {
+        'rss_mb': values.get('Rss', 0) / 1024,
+        'pss_mb': values.get('Pss', 0) / 1024,
+        'private_mb': private / 1024,
+    }
+
+
+def child_pids(pid):
+    """Direct children of a process"""
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_until_ready(url, timeout=120):
+    """Poll the server until it answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure gunicorn worker memory")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--no-preload', action='store_true', help="Load the model in every worker")
+    parser.add_argument('--requests', type=int, default=50, help="Warm-up requests before measuring")
+    args = parser.parse_args()
+
+    cmd = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers),
+           '-b', f"127.0.0.1:{args.port}", 'backend.app:app']
+    if not args.no_preload:
+        cmd.insert(3, '--preload')
+
+    server = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if not wait_until_ready(base_url + "/debug"):
+            print("❌ Server did not start")
+            return False
+
+        # Touch the model in every worker
+        for _ in range(args.requests):
+            request = urllib.request.Request(
+                base_url + "/recommend", data=b'{"movie_name": "the"}',
+                headers={'Content-Type': 'application/json'}
+            )
+            urllib.request.urlopen(request).read()
+
+        print(f"{'pid':>8} {'RSS MB':>9} {'PSS MB':>9} {'private MB':>11}")
+        master = read_smaps_rollup(server.pid)
+        print(f"{server.pid:>8} {master['rss_mb']:>9.1f} {master['pss_mb']:>9.1f} {master['private_mb']:>11.1f}  (master)")
+
+        totals = {'rss_mb': 0.0, 'pss_mb': 0.0, 'private_mb': 0.0}
+        workers = child_pids(server.pid)
+        for pid in workers:
+            usage = read_smaps_rollup(pid)
+            for key in totals:
+                totals[key] += usage[key]
+            print(f"{pid:>8} {usage['rss_mb']:>9.1f} {usage['pss_mb']:>9.1f} {usage['private_mb']:>11.1f}")
+
+        n = max(len(workers), 1)
+        print(f"\nPer worker (avg): RSS {totals['rss_mb'] / n:.1f} MB, "
+              f"PSS {totals['pss_mb'] / n:.1f} MB, private {totals['private_mb'] / n:.1f} MB")
+        return True
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)